@@ -0,0 +1,17 @@
+import os
+
+# 本番用の gunicorn 設定（gunicorn -c gunicorn.conf.py）
+#
+# /api/events の購読者はイベントを待つ間も接続を開いたままにするため、
+# gevent の協調的ワーカーで配信する。gevent ワーカーは起動時に threading などを
+# monkey patch するので、待機中の購読者はOSスレッドを占有しない。
+
+wsgi_app = "src.main:app"
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+worker_class = "gevent"
+# ワーカーを増やした場合も、公開されたデータは data/published.json を通じて各ワーカーが読み直す
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+# 1ワーカーあたりの同時接続数の上限（SSEの購読者を含む）
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", "1000"))
+# アプリの読み込みを monkey patch の後にするため、マスターでは読み込まない
+preload_app = False
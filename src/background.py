@@ -0,0 +1,37 @@
+import threading
+
+# バックグラウンド処理の起動
+#
+# gunicorn.conf.py の gevent ワーカーでは threading が monkey patch され、
+# threading.Thread はリクエストと同じOSスレッド上のグリーンレットになる。
+# その状態で asyncio.run を呼ぶと、同じOSスレッドで動いている別のイベントループ
+# （非同期ビューなど）と衝突して失敗し、CPUを使う処理はハブ全体を止めてしまう。
+# そのため、更新処理などは gevent のネイティブスレッドプールで実行する。
+
+
+def gevent_patched():
+    """gevent で threading が monkey patch されているか"""
+    try:
+        from gevent.monkey import is_module_patched
+    except ImportError:
+        return False
+    return is_module_patched("threading")
+
+
+def _native_threadpool():
+    """gevent で threading が patch されていればネイティブスレッドプールを返す"""
+    if not gevent_patched():
+        return None
+    from gevent import get_hub
+
+    return get_hub().threadpool
+
+
+def run_in_thread(target, name, *args, **kwargs):
+    """target をOSスレッドで実行し、終了を待つための関数を返す"""
+    pool = _native_threadpool()
+    if pool is not None:
+        return pool.spawn(target, *args, **kwargs).wait
+    thread = threading.Thread(target=target, name=name, args=args, kwargs=kwargs, daemon=True)
+    thread.start()
+    return thread.join
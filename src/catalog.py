@@ -0,0 +1,289 @@
+import asyncio
+import heapq
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from itertools import islice
+
+import aiohttp
+
+from src.background import run_in_thread
+from src.data_collector import BASE_URL, COUNTRIES, INDICATORS
+from src.structured_logging import get_logger, setup_logging
+
+logger = get_logger("catalog")
+
+# 取得したカタログの保存先
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "catalog.json")
+# 前方一致で展開するトークン数の上限（短すぎる入力で候補が爆発しないように）
+MAX_PREFIX_EXPANSION = 64
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# カタログの取得に失敗したときに取得し直すまでの間隔（秒）。以降は最後の値を使う
+FETCH_RETRY_DELAYS = (30, 120, 600)
+
+_WORD_PATTERN = re.compile(r"[0-9a-z]+")
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-鿿豈-﫿]+")
+
+_lock = threading.Lock()
+_index = None
+# 組み込みのカタログ（追跡中の国・指標のみ）で検索しているか
+_using_builtin = False
+_fetch_lock = threading.Lock()
+_fetching = False
+_fetch_failures = 0
+_next_fetch_at = 0.0
+
+
+async def _fetch_json(session, path, params):
+    async with session.get(f"{BASE_URL}/{path}", params={"format": "json", **params}) as response:
+        response.raise_for_status()
+        data = await response.json(content_type=None)
+        return data[1] if data and len(data) > 1 and data[1] else []
+
+
+async def fetch_catalog():
+    """World Bank APIから指標・国のメタデータを取得して保存"""
+    async with aiohttp.ClientSession() as session:
+        indicators, countries = await asyncio.gather(
+            _fetch_json(session, "indicator", {"per_page": 30000}),
+            _fetch_json(session, "country", {"per_page": 400}),
+        )
+
+    catalog = {
+        "indicators": [
+            {
+                "code": item["id"],
+                "name": item.get("name") or "",
+                "topics": [t["value"].strip() for t in item.get("topics") or [] if t.get("value")],
+                "source": (item.get("source") or {}).get("value", ""),
+            }
+            for item in indicators
+        ],
+        "countries": [
+            {
+                "code": item["id"],
+                "name": item.get("name") or "",
+                "region": (item.get("region") or {}).get("value", "").strip(),
+                "incomeLevel": (item.get("incomeLevel") or {}).get("value", "").strip(),
+            }
+            for item in countries
+        ],
+    }
+
+    os.makedirs(os.path.dirname(CATALOG_PATH), exist_ok=True)
+    with open(CATALOG_PATH, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False)
+    logger.info(
+        "カタログを保存しました",
+        extra={"indicators": len(catalog["indicators"]), "countries": len(catalog["countries"])},
+    )
+    return catalog
+
+
+def _builtin_catalog():
+    """保存済みカタログがない場合に使う、追跡中の国・指標のみのカタログ"""
+    return {
+        "indicators": [{"code": code, "name": "", "topics": [], "source": ""} for code in INDICATORS],
+        "countries": [{"code": code, "name": "", "region": "", "incomeLevel": ""} for code in COUNTRIES],
+    }
+
+
+def _load_catalog():
+    if os.path.exists(CATALOG_PATH):
+        with open(CATALOG_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
+def tokenize(text):
+    """英数字は単語単位、日本語は文字バイグラムに分割"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    tokens = _WORD_PATTERN.findall(text)
+    for run in _CJK_PATTERN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def build_index(catalog):
+    """カタログから転置索引・前方一致索引を作成
+
+    文書IDは静的な優先度（追跡中の国・指標、名前の短いもの）の順に振るため、
+    同じスコアの候補は文書IDの小さい順に並べればよい。
+    """
+    documents = [
+        {
+            "type": "indicator",
+            "code": item["code"],
+            "name": item["name"],
+            "nameJa": INDICATORS.get(item["code"], ""),
+            "topics": item["topics"],
+            "tracked": item["code"] in INDICATORS,
+        }
+        for item in catalog["indicators"]
+    ] + [
+        {
+            "type": "country",
+            "code": item["code"],
+            "name": item["name"],
+            "nameJa": COUNTRIES.get(item["code"], ""),
+            "region": item["region"],
+            "incomeLevel": item["incomeLevel"],
+            "tracked": item["code"] in COUNTRIES,
+        }
+        for item in catalog["countries"]
+    ]
+    documents.sort(key=lambda doc: (not doc["tracked"], len(doc["name"]), doc["code"]))
+
+    postings = {}
+    by_type = {}
+    by_topic = {}
+    names = []
+    for doc_id, document in enumerate(documents):
+        texts = (document["name"], document["nameJa"], " ".join(document.get("topics", [])))
+        for token in set(t for text in texts for t in tokenize(text)):
+            postings.setdefault(token, set()).add(doc_id)
+        by_type.setdefault(document["type"], set()).add(doc_id)
+        for topic in document.get("topics", []):
+            by_topic.setdefault(topic.lower(), set()).add(doc_id)
+        for name in (document["name"], document["nameJa"]):
+            if name:
+                names.append((unicodedata.normalize("NFKC", name).lower(), doc_id))
+
+    return {
+        "documents": documents,
+        "postings": postings,
+        "tokens": sorted(postings),
+        "codes": sorted((doc["code"].lower(), i) for i, doc in enumerate(documents)),
+        "names": sorted(names),
+        "byType": by_type,
+        "byTopic": by_topic,
+        "tracked": {i for i, doc in enumerate(documents) if doc["tracked"]},
+    }
+
+
+def _tokens_with_prefix(tokens, prefix):
+    """ソート済みのトークン一覧から prefix で始まるものを列挙"""
+    for token in tokens[bisect_left(tokens, prefix):]:
+        if not token.startswith(prefix):
+            break
+        yield token
+
+
+def _keys_with_prefix(entries, prefix):
+    """ソート済みの (キー, 文書ID) 一覧から prefix で始まる文書IDを列挙"""
+    for key, doc_id in entries[bisect_left(entries, (prefix,)):]:
+        if not key.startswith(prefix):
+            break
+        yield doc_id
+
+
+def get_index():
+    """検索索引を返す（初回に読み込み、カタログ未取得ならバックグラウンドで取得）"""
+    global _index, _using_builtin
+    if _index is None:
+        with _lock:
+            if _index is None:
+                catalog = _load_catalog()
+                _using_builtin = catalog is None
+                _index = build_index(_builtin_catalog() if _using_builtin else catalog)
+    if _using_builtin:
+        # 取得に失敗していても、間隔を空けて取得し直す
+        _start_background_fetch()
+    return _index
+
+
+def _start_background_fetch():
+    global _fetching
+    with _fetch_lock:
+        if _fetching or time.monotonic() < _next_fetch_at:
+            return
+        _fetching = True
+
+    def worker():
+        global _index, _using_builtin, _fetching, _fetch_failures, _next_fetch_at
+        try:
+            catalog = asyncio.run(fetch_catalog())
+        except Exception as e:
+            delay = FETCH_RETRY_DELAYS[min(_fetch_failures, len(FETCH_RETRY_DELAYS) - 1)]
+            _fetch_failures += 1
+            _next_fetch_at = time.monotonic() + delay
+            logger.warning("カタログの取得に失敗", extra={"error": str(e), "retrySeconds": delay})
+        else:
+            index = build_index(catalog)
+            with _lock:
+                _index = index
+                _using_builtin = False
+        finally:
+            with _fetch_lock:
+                _fetching = False
+
+    run_in_thread(worker, "catalog-fetch")
+
+
+def search(query, doc_type=None, topic=None, limit=DEFAULT_LIMIT):
+    """名前（英語・日本語）、コードの前方一致、トピックで検索"""
+    normalized = unicodedata.normalize("NFKC", query or "").strip().lower()
+    if not normalized:
+        return []
+    index = get_index()
+    tokens = tokenize(normalized)
+
+    # 単語の一致: 最後の単語は入力途中とみなして前方一致、それ以外は完全一致（AND）
+    matched = set()
+    if tokens:
+        *complete, last = tokens
+        for token in islice(_tokens_with_prefix(index["tokens"], last), MAX_PREFIX_EXPANSION):
+            matched |= index["postings"][token]
+        for token in complete:
+            matched &= index["postings"].get(token, set())
+
+    allowed = None
+    if doc_type:
+        allowed = index["byType"].get(doc_type, set())
+    if topic:
+        topic_docs = index["byTopic"].get(topic.lower(), set())
+        allowed = topic_docs if allowed is None else allowed & topic_docs
+
+    def prefix_hits(entries):
+        hits = _keys_with_prefix(entries, normalized)
+        if allowed is not None:
+            hits = (doc_id for doc_id in hits if doc_id in allowed)
+        return set(islice(hits, MAX_PREFIX_EXPANSION))
+
+    code_hits = prefix_hits(index["codes"])
+    name_hits = prefix_hits(index["names"])
+    if allowed is not None:
+        matched &= allowed
+
+    # 加点のある少数の文書だけ個別にスコアを計算し、残りは文書IDの順に取る
+    token_score = len(tokens)
+    special = code_hits | name_hits | (matched & index["tracked"])
+    ranked = []
+    for doc_id in special:
+        score = (
+            10 * (doc_id in code_hits)
+            + token_score * (doc_id in matched)
+            + 3 * (doc_id in name_hits)
+            + 5 * (doc_id in index["tracked"])
+        )
+        ranked.append((-score, doc_id))
+    ranked.sort()
+    ranked = ranked[:limit]
+    if len(ranked) < limit:
+        rest = heapq.nsmallest(limit + len(special), matched)
+        ranked.extend((-token_score, doc_id) for doc_id in rest if doc_id not in special)
+        ranked = ranked[:limit]
+
+    return [{**index["documents"][doc_id], "score": -score} for score, doc_id in ranked]
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(fetch_catalog())
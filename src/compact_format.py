@@ -0,0 +1,76 @@
+from src.data_collector import COUNTRIES, INDICATORS
+
+# コンパクト形式のフォーマット識別子
+COMPACT_FORMAT = "compact-v1"
+
+
+def _index_of(table, lookup, key, *columns):
+    """ディメンション表に行を追加し、そのインデックスを返す"""
+    if key not in lookup:
+        lookup[key] = len(table["code"])
+        table["code"].append(key)
+        for name, value in columns:
+            table[name].append(value)
+    return lookup[key]
+
+
+def encode_compact(records, summary=None, version=None):
+    """レコードのリストを辞書エンコードしたコンパクト形式に変換
+
+    国・指標・単位は一度だけディメンション表に格納し、各系列は
+    (国, 指標, 単位) のインデックス、開始年、開始年からの密な値配列で表す。
+    欠損年は null で埋める。
+    """
+    countries = {"code": [], "name": [], "label": []}
+    indicators = {"code": [], "name": []}
+    units = []
+    country_lookup, indicator_lookup, unit_lookup = {}, {}, {}
+
+    grouped = {}
+    for record in records:
+        key = (record["countryCode"], record["indicatorCode"])
+        grouped.setdefault(key, []).append(record)
+
+    series = {"country": [], "indicator": [], "unit": [], "startYear": [], "values": []}
+    for (country_code, indicator_code), items in grouped.items():
+        first = items[0]
+        series["country"].append(_index_of(
+            countries, country_lookup, country_code,
+            ("name", COUNTRIES.get(country_code, first["country"])),
+            ("label", first["country"]),
+        ))
+        series["indicator"].append(_index_of(
+            indicators, indicator_lookup, indicator_code,
+            ("name", INDICATORS.get(indicator_code, first["indicator"])),
+        ))
+        if first["unit"] not in unit_lookup:
+            unit_lookup[first["unit"]] = len(units)
+            units.append(first["unit"])
+        series["unit"].append(unit_lookup[first["unit"]])
+
+        by_year = {item["year"]: item["value"] for item in items}
+        start_year = min(by_year)
+        series["startYear"].append(start_year)
+        series["values"].append(
+            [by_year.get(year) for year in range(start_year, max(by_year) + 1)]
+        )
+
+    payload = {
+        "format": COMPACT_FORMAT,
+        "countries": countries,
+        "indicators": indicators,
+        "units": units,
+        "series": series,
+    }
+    if version is not None:
+        payload["version"] = version
+    if summary is not None:
+        payload["summary"] = summary
+    return payload
+
+
+def iter_records(economic_data):
+    """整理済みデータから重複なしでレコードを列挙（byCountry を正とする）"""
+    for country in (economic_data.get("byCountry") or {}).values():
+        yield from country["data"]
+
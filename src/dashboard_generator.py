@@ -1,24 +1,79 @@
 
 import os
 import json
+import hashlib
+import multiprocessing
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from html import escape
+
+from src.background import gevent_patched
+from src.dataset_store import STATIC_DIR, compute_version
+from src.profiling import timed_stage
+from src.structured_logging import get_logger, setup_logging
+from src.svg_renderer import (
+    CHART_SPECS,
+    PALETTE,
+    TREND_COUNTRIES,
+    render_bar_chart,
+    render_line_chart,
+    render_sparkline,
+)
+
+logger = get_logger("generator")
+
+# 静的ページのテンプレートを変更したら上げる（全ページを再生成させるため）
+PAGE_TEMPLATE_VERSION = 1
+# この件数以上のページを再生成するときはプロセスプールで並列化する
+PARALLEL_PAGE_THRESHOLD = 8
+# SVGを保持するデータセットのバージョン数（古いページを開いている利用者向けに直前の版も残す）
+SVG_VERSIONS_TO_KEEP = 2
+# トレンドチャートの表示年数
+TREND_YEARS = 20
+# SVGの書き出し先（Flaskの静的フォルダ配下）
+SVG_DIR = os.path.join(STATIC_DIR, "svg")
+# 配信する index.html 中の置き換え箇所（SVGの配信先と国別カード）
+SVG_BASE_PLACEHOLDER = "/static/svg/current"
+COUNTRY_CARDS_PLACEHOLDER = "<!-- country-cards -->"
+
+# 国別カードの指標（表示ラベル、値の種類）
+CARD_METRICS = {
+    "NY.GDP.MKTP.CD": ("GDP", "trillion"),
+    "NY.GDP.MKTP.KD.ZG": ("成長率", "percent"),
+    "SL.UEM.TOTL.ZS": ("失業率", "percent"),
+    "FP.CPI.TOTL.ZG": ("インフレ率", "percent"),
+}
+
+COUNTRY_FLAGS = {
+    "JPN": "🇯🇵", "USA": "🇺🇸", "CHN": "🇨🇳", "DEU": "🇩🇪", "GBR": "🇬🇧", "FRA": "🇫🇷",
+    "IND": "🇮🇳", "BRA": "🇧🇷", "CAN": "🇨🇦", "AUS": "🇦🇺", "IDN": "🇮🇩", "PER": "🇵🇪",
+}
 
 
 def generate_dashboard(economic_data, analysis):
     """HTMLダッシュボードを生成"""
     try:
-        print("🎨 HTMLダッシュボードを生成中...")
-        generate_html(economic_data, analysis)
+        started = time.perf_counter()
+        svg_base = generate_svg_assets(economic_data)
+        generate_html(economic_data, analysis, svg_base)
         generate_css()
         generate_js(economic_data, analysis)
-        print("✅ ダッシュボード生成完了")
+        generate_static_pages(economic_data, analysis)
+        logger.info(
+            "ダッシュボード生成完了",
+            extra={"elapsedMs": round((time.perf_counter() - started) * 1000)},
+        )
     except Exception as e:
-        print(f"❌ ダッシュボード生成でエラーが発生: {e}")
+        logger.error("ダッシュボード生成でエラーが発生", extra={"error": str(e)})
         raise
 
 
-def generate_html(economic_data, analysis):
-    """HTMLファイルを生成"""
+@timed_stage
+def generate_html(economic_data, analysis, svg_base=None):
+    """HTMLファイルを生成（svg_base を渡すとJS実行前に表示するSVGを埋め込む）"""
     overview_summary = (analysis.get("overview", {}) or {}).get("summary", "データを読み込み中...")
     overview_key_findings = (analysis.get("overview", {}) or {}).get("keyFindings", ["分析中..."])
 
@@ -38,6 +93,16 @@ def generate_html(economic_data, analysis):
         ]
     )
 
+    countries_html = _country_cards_html(economic_data, analysis, svg_base) if svg_base else ""
+
+    def chart_fallback(chart_id):
+        if not svg_base:
+            return ""
+        return (
+            f'<img class="chart-fallback" src="{svg_base}/{chart_id}.svg" '
+            f'alt="" width="480" height="260">'
+        )
+
     html = f"""<!DOCTYPE html>
 <html lang="ja">
 <head>
@@ -82,7 +147,8 @@ def generate_html(economic_data, analysis):
 
         <section class="countries-section">
             <h2>🌍 国別分析</h2>
-            <div class="countries-grid" id="countriesGrid">
+            <div class="countries-grid" id="countriesGrid" data-svg-base="{svg_base or ''}">
+                {countries_html}
             </div>
         </section>
 
@@ -101,34 +167,42 @@ def generate_html(economic_data, analysis):
             <div class="charts-grid">
                 <div class="chart-card">
                     <h3>GDP比較（最新年）</h3>
+                    {chart_fallback("gdpChart")}
                     <canvas id="gdpChart"></canvas>
                 </div>
                 <div class="chart-card">
                     <h3>GDP成長率トレンド</h3>
+                    {chart_fallback("gdpGrowthChart")}
                     <canvas id="gdpGrowthChart"></canvas>
                 </div>
                 <div class="chart-card">
                     <h3>失業率比較</h3>
+                    {chart_fallback("unemploymentChart")}
                     <canvas id="unemploymentChart"></canvas>
                 </div>
                 <div class="chart-card">
                     <h3>一人当たりGDP比較</h3>
+                    {chart_fallback("gdpPerCapitaChart")}
                     <canvas id="gdpPerCapitaChart"></canvas>
                 </div>
                 <div class="chart-card">
                     <h3>インフレ率トレンド</h3>
+                    {chart_fallback("inflationChart")}
                     <canvas id="inflationChart"></canvas>
                 </div>
                 <div class="chart-card">
                     <h3>貿易トレンド</h3>
+                    {chart_fallback("tradeChart")}
                     <canvas id="tradeChart"></canvas>
                 </div>
                 <div class="chart-card">
                     <h3>総人口トレンド</h3>
+                    {chart_fallback("populationChart")}
                     <canvas id="populationChart"></canvas>
                 </div>
                 <div class="chart-card">
                     <h3>外国直接投資トレンド</h3>
+                    {chart_fallback("fdiChart")}
                     <canvas id="fdiChart"></canvas>
                 </div>
             </div>
@@ -168,7 +242,7 @@ def generate_html(economic_data, analysis):
                 <p>
                     データソース: <a href="https://data.worldbank.org/" target="_blank">World Bank Open Data</a> | 
                     AI分析: <a href="https://ai.google.dev/" target="_blank">Google Gemini</a> | 
-                    更新: GitHub Actions
+                    更新: 定期自動更新
                 </p>
                 <p class="footer-note">
                     このダッシュボードは自動更新されます。最新のデータと分析をお楽しみください。
@@ -187,9 +261,10 @@ def generate_html(economic_data, analysis):
 
     with open(file_path, "w", encoding="utf-8") as f:
         f.write(html)
-    print("💾 HTMLファイルを生成しました: index.html")
+    logger.debug("HTMLファイルを生成しました", extra={"file": "index.html"})
 
 
+@timed_stage
 def generate_css():
     """CSSファイルを生成"""
     css = """
@@ -556,6 +631,50 @@ def generate_css():
         margin-top: 10px;
     }
 
+    /* Server-rendered SVG */
+    .sparkline {
+        display: block;
+        width: 100%;
+        max-width: 120px;
+        height: 32px;
+        margin: 6px auto 0;
+    }
+
+    .chart-fallback {
+        display: block;
+        width: 100%;
+        height: auto;
+    }
+
+    /* JSがチャートを描画するまではSVGのみ表示 */
+    .chart-fallback + canvas {
+        display: none;
+    }
+
+    /* Update notice */
+    .update-notice {
+        display: none;
+        position: fixed;
+        right: 20px;
+        bottom: 20px;
+        padding: 12px 20px;
+        background: rgba(44, 62, 80, 0.95);
+        color: #fff;
+        border-radius: 10px;
+        box-shadow: 0 6px 25px rgba(0, 0, 0, 0.2);
+        z-index: 1000;
+    }
+
+    .update-notice button {
+        margin-left: 10px;
+        padding: 4px 12px;
+        border: none;
+        border-radius: 6px;
+        background: #3498db;
+        color: #fff;
+        cursor: pointer;
+    }
+
     /* Responsive */
     @media (max-width: 768px) {
         .title {
@@ -577,9 +696,10 @@ def generate_css():
 
     with open(file_path, "w", encoding="utf-8") as f:
         f.write(css)
-    print("💾 CSSファイルを生成しました: style.css")
+    logger.debug("CSSファイルを生成しました", extra={"file": "style.css"})
 
 
+@timed_stage
 def generate_js(economic_data, analysis):
     """JavaScriptファイルを生成"""
     js = f"""
@@ -590,6 +710,7 @@ document.addEventListener('DOMContentLoaded', () => {{
     if (economicData && analysis) {{
         renderCountryCards(economicData, analysis);
         renderIndicatorTabs(economicData, analysis);
+        document.querySelectorAll('.chart-fallback').forEach(img => img.remove());
         renderCharts(economicData);
         setupDataFilters(economicData);
     }}
@@ -604,6 +725,8 @@ document.addEventListener('DOMContentLoaded', () => {{
 function renderCountryCards(economicData, analysis) {{
     const grid = document.getElementById('countriesGrid');
     if (!grid) return;
+    // サーバー側で描画したカードを置き換える
+    grid.innerHTML = '';
 
     const countryOrder = ['JPN', 'USA', 'CHN', 'DEU', 'GBR', 'FRA', 'IND', 'BRA', 'CAN', 'AUS', 'IDN', 'PER'];
 
@@ -652,12 +775,369 @@ function renderCountryCards(economicData, analysis) {{
 
     with open(file_path, "w", encoding="utf-8") as f:
         f.write(js)
-    print("💾 JavaScriptファイルを生成しました: script.js")
+    logger.debug("JavaScriptファイルを生成しました", extra={"file": "script.js"})
+
+
+def _format_page_value(value, unit):
+    """静的ページ用に値を整形"""
+    if value is None:
+        return "N/A"
+    if unit == "%":
+        return f"{value:,.1f}%"
+    if unit == "米ドル":
+        return f"${value:,.0f}"
+    return f"{value:,.0f}{unit}"
+
+
+def _latest_records(records):
+    """指標ごとの最新年のレコードを返す"""
+    latest = {}
+    for record in records:
+        current = latest.get(record["indicatorCode"])
+        if current is None or record["year"] > current["year"]:
+            latest[record["indicatorCode"]] = record
+    return latest
+
+
+def _analysis_section(title, paragraphs, items):
+    """AI分析のHTML断片を生成"""
+    body = "".join(f"<p>{escape(str(p))}</p>" for p in paragraphs if p)
+    body += "".join(f"<li>{escape(str(item))}</li>" for item in items)
+    if not body:
+        return ""
+    return f"""
+        <section class="ai-analysis-section">
+            <h4>🤖 {escape(title)}</h4>
+            <div class="ai-analysis-content">{body}</div>
+        </section>"""
+
+
+def _render_page(job):
+    """1ページ分のHTMLを生成して書き出す（プロセスプールのワーカーで実行）"""
+    records = sorted(job["records"], key=lambda r: (r["indicatorCode"], -r["year"]))
+    latest = _latest_records(records)
+    label_key = "country" if job["kind"] == "indicator" else "indicator"
+
+    metrics_html = "".join(
+        f"""
+                <div class="metric-item">
+                    <div class="metric-label">{escape(record[label_key])}（{record["year"]}年）</div>
+                    <div class="metric-value">{_format_page_value(record["value"], record["unit"])}</div>
+                </div>"""
+        for record in latest.values()
+    )
+    rows_html = "".join(
+        f"""
+                    <tr>
+                        <td>{record["year"]}</td>
+                        <td>{escape(record["country"])}</td>
+                        <td>{escape(record["indicator"])}</td>
+                        <td>{_format_page_value(record["value"], record["unit"])}</td>
+                        <td>{escape(record["unit"])}</td>
+                    </tr>"""
+        for record in records
+    )
+    # </script> でタグが閉じないようにエスケープして埋め込む
+    page_data = json.dumps(
+        {"code": job["code"], "name": job["name"], "data": job["records"]}, ensure_ascii=False
+    ).replace("</", "<\\/")
+
+    html = f"""<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{escape(job["name"])} - World Bank Economic Dashboard</title>
+    <link rel="stylesheet" href="/static/style.css">
+</head>
+<body>
+    <div class="container">
+        <header class="header">
+            <div class="header-content">
+                <h1 class="title">{escape(job["name"])}</h1>
+                <p class="subtitle"><a href="/">← ダッシュボードに戻る</a></p>
+                <div class="last-updated">最終更新: {escape(job["lastUpdated"])}</div>
+            </div>
+        </header>
+
+        <section class="overview-section">
+            <div class="overview-card">
+                <h2>📈 最新の指標</h2>
+                <div class="country-metrics">{metrics_html}
+                </div>{job["analysisHtml"]}
+            </div>
+        </section>
+
+        <section class="data-section">
+            <h2>📋 詳細データ</h2>
+            <div class="data-table-container">
+                <table class="data-table">
+                    <thead>
+                        <tr>
+                            <th>年</th>
+                            <th>国</th>
+                            <th>指標</th>
+                            <th>値</th>
+                            <th>単位</th>
+                        </tr>
+                    </thead>
+                    <tbody>{rows_html}
+                    </tbody>
+                </table>
+            </div>
+        </section>
+    </div>
+
+    <script type="application/json" id="pageData">{page_data}</script>
+</body>
+</html>"""
+
+    os.makedirs(os.path.dirname(job["path"]), exist_ok=True)
+    with open(job["path"], "w", encoding="utf-8") as f:
+        f.write(html)
+    return job["path"]
+
+
+def _page_jobs(economic_data, analysis, public_dir):
+    """国別・指標別ページの生成ジョブを作成"""
+    country_analysis = analysis.get("byCountry") or analysis.get("countries") or {}
+    indicator_analysis = analysis.get("byIndicator") or analysis.get("indicators") or {}
+    last_updated = (economic_data.get("summary") or {}).get("lastUpdated", "")
+
+    jobs = []
+    for code, country in (economic_data.get("byCountry") or {}).items():
+        result = country_analysis.get(code) or {}
+        jobs.append({
+            "kind": "country",
+            "code": code,
+            "name": country["name"],
+            "records": country["data"],
+            "lastUpdated": last_updated,
+            "analysisHtml": _analysis_section(
+                "AI分析コメント",
+                [result.get("economicOverview") or result.get("overview"), result.get("outlook")],
+                (result.get("strengths") or []) + (result.get("challenges") or []),
+            ),
+            "path": os.path.join(public_dir, "countries", f"{code}.html"),
+        })
+    for code, indicator in (economic_data.get("byIndicator") or {}).items():
+        result = indicator_analysis.get(code) or {}
+        jobs.append({
+            "kind": "indicator",
+            "code": code,
+            "name": indicator["name"],
+            "records": indicator["data"],
+            "lastUpdated": last_updated,
+            "analysisHtml": _analysis_section(
+                "AI分析コメント",
+                [result.get("analysis"), result.get("globalTrends")],
+                result.get("insights") or [],
+            ),
+            "path": os.path.join(public_dir, "indicators", f"{code}.html"),
+        })
+    return jobs
+
+
+def _job_fingerprint(job):
+    # lastUpdated は収集のたびに変わるため含めない（データが同じなら再生成しない）
+    inputs = {key: value for key, value in job.items() if key != "lastUpdated"}
+    payload = json.dumps(
+        [PAGE_TEMPLATE_VERSION, inputs], sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@timed_stage
+def generate_static_pages(economic_data, analysis):
+    """国別・指標別の静的ページを生成（入力が変わったページのみ）"""
+    # /countries/JPN などで配信されるよう、Flaskの静的フォルダに書き出す
+    public_dir = STATIC_DIR
+    manifest_path = os.path.join(public_dir, "pages-manifest.json")
+
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+    jobs = _page_jobs(economic_data, analysis or {}, public_dir)
+    fingerprints = {}
+    pending = []
+    for job in jobs:
+        name = os.path.relpath(job["path"], public_dir)
+        fingerprints[name] = _job_fingerprint(job)
+        if manifest.get(name) != fingerprints[name] or not os.path.exists(job["path"]):
+            pending.append(job)
+
+    if len(pending) >= PARALLEL_PAGE_THRESHOLD:
+        workers = min(len(pending), os.cpu_count() or 1)
+        # gevent ワーカーでは patch 済みのプロセスから fork できないため spawn で起動する
+        context = multiprocessing.get_context("spawn") if gevent_patched() else None
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            list(executor.map(_render_page, pending, chunksize=max(1, len(pending) // (workers * 4))))
+    else:
+        for job in pending:
+            _render_page(job)
+
+    os.makedirs(public_dir, exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, ensure_ascii=False, indent=2)
+    logger.info(
+        "静的ページを生成しました",
+        extra={"rendered": len(pending), "unchanged": len(jobs) - len(pending)},
+    )
+
+
+def _values_by_year(records, indicator_code):
+    return {r["year"]: r["value"] for r in records if r["indicatorCode"] == indicator_code}
+
+
+def _sparkline_path(country_code, indicator_code):
+    return f"sparklines/{country_code}-{indicator_code}.svg"
+
+
+def _format_card_value(value, value_type):
+    """国別カード用に値を整形（script.js の formatValue と同じ表記）"""
+    if value is None:
+        return "N/A"
+    if value_type == "trillion":
+        return f"{value / 1e12:.1f}兆ドル"
+    return f"{value:.1f}%"
+
+
+def _country_cards_html(economic_data, analysis, svg_base):
+    """JS実行前に表示する国別カード（スパークライン付き）を生成"""
+    country_analysis = analysis.get("byCountry") or analysis.get("countries") or {}
+    cards = []
+    for code, country in (economic_data.get("byCountry") or {}).items():
+        latest = _latest_records(country["data"])
+        metrics_html = "".join(
+            f"""
+                    <div class="metric-item">
+                        <div class="metric-label">{label}</div>
+                        <div class="metric-value">{_format_card_value(latest[indicator_code]["value"] if indicator_code in latest else None, value_type)}</div>
+                        <img class="sparkline" src="{svg_base}/{_sparkline_path(code, indicator_code)}" alt="" width="120" height="32" loading="lazy">
+                    </div>"""
+            for indicator_code, (label, value_type) in CARD_METRICS.items()
+        )
+        overview = (country_analysis.get(code) or {}).get("economicOverview") or "分析中..."
+        cards.append(f"""
+                <div class="country-card">
+                    <div class="country-header">
+                        <span class="country-flag">{COUNTRY_FLAGS.get(code, "🏳️")}</span>
+                        <h3 class="country-name">{escape(country["name"])}</h3>
+                    </div>
+                    <div class="country-overview">{escape(str(overview))}</div>
+                    <div class="country-metrics">{metrics_html}
+                    </div>
+                </div>""")
+    return "".join(cards)
+
+
+def _render_chart_svgs(economic_data):
+    """8つのチャートとスパークラインのSVGを生成（ファイル名 → SVG文字列）"""
+    by_country = economic_data.get("byCountry") or {}
+    years = sorted({r["year"] for country in by_country.values() for r in country["data"]})
+    files = {}
+
+    for chart_id, spec in CHART_SPECS.items():
+        indicator_code = spec["indicator"]
+        title = (economic_data.get("byIndicator") or {}).get(indicator_code, {}).get("name", indicator_code)
+        if spec["type"] == "bar":
+            bars = []
+            for country in by_country.values():
+                latest = _latest_records(country["data"]).get(indicator_code)
+                if latest is not None:
+                    bars.append((country["name"], latest["value"] / spec["scale"]))
+            bars.sort(key=lambda bar: bar[1], reverse=spec["order"] == "desc")
+            files[f"{chart_id}.svg"] = render_bar_chart(
+                [label for label, _ in bars], [value for _, value in bars], spec["unit"], title
+            )
+        else:
+            trend_years = years[-TREND_YEARS:]
+            series = []
+            for code in TREND_COUNTRIES:
+                if code not in by_country:
+                    continue
+                values = _values_by_year(by_country[code]["data"], indicator_code)
+                series.append((
+                    by_country[code]["name"],
+                    [None if values.get(y) is None else values[y] / spec["scale"] for y in trend_years],
+                ))
+            files[f"{chart_id}.svg"] = render_line_chart(trend_years, series, spec["unit"], title)
+
+    for code, country in by_country.items():
+        for i, indicator_code in enumerate(CARD_METRICS):
+            values = _values_by_year(country["data"], indicator_code)
+            files[_sparkline_path(code, indicator_code)] = render_sparkline(
+                [values.get(y) for y in years], color=PALETTE[i % len(PALETTE)]
+            )
+    return files
+
+
+@timed_stage
+def generate_svg_assets(economic_data, version=None):
+    """チャートのSVGとスパークラインをデータセットのバージョンごとに生成
+
+    src/static/svg/<バージョン>/ に書き出し、同じバージョンが既にあれば再利用する。
+    配信用のURLの接頭辞を返す。
+    """
+    version = version or compute_version(economic_data)
+    svg_root = SVG_DIR
+    version_dir = os.path.join(svg_root, version)
+
+    if os.path.isdir(version_dir):
+        # 再利用した版を最新として扱い、古い版の削除対象から外す
+        os.utime(version_dir)
+        logger.debug("SVGは生成済みです", extra={"version": version})
+    else:
+        # 書きかけのディレクトリが配信されないよう、一時ディレクトリに書いてから差し替える
+        staging_dir = f"{version_dir}.tmp-{os.getpid()}"
+        files = _render_chart_svgs(economic_data)
+        for name, svg in files.items():
+            path = os.path.join(staging_dir, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(svg)
+        try:
+            os.rename(staging_dir, version_dir)
+        except OSError:
+            # 他のプロセスが同じバージョンを先に書き出した
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        logger.info("SVGを生成しました", extra={"version": version, "files": len(files)})
+
+    versions = sorted(
+        (entry for entry in os.scandir(svg_root) if entry.is_dir() and ".tmp-" not in entry.name),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in versions[SVG_VERSIONS_TO_KEEP:]:
+        if entry.name != version:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    return f"/static/svg/{version}"
+
+
+_FALLBACK_IMAGE_PATTERN = re.compile(r'\s*<img class="chart-fallback"[^>]*>')
+
+
+def render_served_index(html, snapshot):
+    """配信する index.html に公開中のバージョンのSVGと国別カードを埋め込む
+
+    データがまだない場合はSVGの参照を取り除く。
+    """
+    if snapshot is None:
+        html = _FALLBACK_IMAGE_PATTERN.sub("", html)
+        return html.replace(SVG_BASE_PLACEHOLDER, "")
+
+    svg_base = generate_svg_assets(snapshot["economic_data"], snapshot["version"])
+    cards = _country_cards_html(snapshot["economic_data"], snapshot["analysis"] or {}, svg_base)
+    return html.replace(SVG_BASE_PLACEHOLDER, svg_base).replace(COUNTRY_CARDS_PLACEHOLDER, cards)
 
 
 if __name__ == "__main__":
     # This is a placeholder for testing
     dummy_data = {"byCountry": {}, "byIndicator": {}, "summary": {}}
     dummy_analysis = {"overview": {}, "byCountry": {}, "byIndicator": {}}
+    setup_logging()
     generate_dashboard(dummy_data, dummy_analysis)
 
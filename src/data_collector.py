@@ -2,10 +2,23 @@
 import asyncio
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import aiohttp
 
+from src.profiling import timed_stage
+from src.structured_logging import get_logger, setup_logging
+
+logger = get_logger("collector")
+# 実行サマリーに含める失敗系列のサンプル数
+FAILURE_SAMPLE_SIZE = 5
+# レスポンスのJSON解析を行うワーカースレッド数（イベントループを塞がないため）
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", "4"))
+# 1ページあたりの取得件数
+PER_PAGE = 100
+
 # 対象国のコード
 COUNTRIES = {
     "JPN": "日本",
@@ -36,44 +49,107 @@ INDICATORS = {
     "BX.KLT.DINV.CD.WD": "外国直接投資（米ドル）",
 }
 
-# World Bank API基本URL
-BASE_URL = "https://api.worldbank.org/v2"
+# World Bank API基本URL（WORLD_BANK_API_URL でミラーなどに向けられる）
+BASE_URL = os.environ.get("WORLD_BANK_API_URL", "https://api.worldbank.org/v2")
 
 
-async def fetch_indicator_data(
+class WorldBankAPIError(Exception):
+    """World Bank API がエラーオブジェクトを返した"""
+
+
+def parse_indicator_page(body, indicator_code):
+    """レスポンス本文を解析し (レコード, 総ページ数) を返す（ワーカースレッドで実行）"""
+    data = json.loads(body)
+    if data and isinstance(data[0], dict) and "message" in data[0]:
+        # 200 でもエラーオブジェクト（[{"message": [...]}]）が返ることがある
+        messages = data[0]["message"] or [{}]
+        raise WorldBankAPIError(
+            "; ".join(f"{m.get('key', '')}: {m.get('value', '')}" for m in messages)
+        )
+    if not data or len(data) < 2 or not data[1]:
+        return [], 1
+    records = [
+        {
+            "country": item["country"]["value"],
+            "countryCode": item["countryiso3code"],
+            "indicator": INDICATORS[indicator_code],
+            "indicatorCode": indicator_code,
+            "year": int(item["date"]),
+            "value": item["value"],
+            "unit": get_unit(indicator_code),
+        }
+        for item in data[1]
+        if item["value"] is not None
+    ]
+    return records, int(data[0].get("pages") or 1)
+
+
+async def iter_indicator_pages(
     session,
+    executor,
     country_code,
     indicator_code,
     end_year=datetime.now().year,
     start_year=datetime.now().year - 19,
 ):
-    """指定された国と指標のデータを取得"""
+    """指定された国と指標のデータをページ単位で取得して順に返す
+
+    本文の解析はワーカースレッドで行い、解析済みのページは呼び出し側に
+    すぐ渡すため、大きなレスポンスでもイベントループが塞がらない。
+    """
     url = f"{BASE_URL}/country/{country_code}/indicator/{indicator_code}"
-    params = {"format": "json", "date": f"{start_year}:{end_year}", "per_page": 100}
+    loop = asyncio.get_running_loop()
+    page, pages = 1, 1
+    while page <= pages:
+        params = {"format": "json", "date": f"{start_year}:{end_year}", "per_page": PER_PAGE, "page": page}
+        async with session.get(url, params=params) as response:
+            # 200以外は取得失敗として扱い、前回のデータでの補完と再取得の対象にする
+            response.raise_for_status()
+            body = await response.read()
+        records, pages = await loop.run_in_executor(
+            executor, parse_indicator_page, body, indicator_code
+        )
+        del body
+        yield records
+        page += 1
+
+
+async def fetch_indicator_data(
+    session,
+    executor,
+    country_code,
+    indicator_code,
+    failures=None,
+    sink=None,
+    **kwargs,
+):
+    """指定された国と指標のデータを取得し、取得件数を返す（失敗時は failures に記録）
 
-    print(f"  📈 {COUNTRIES[country_code]} - {INDICATORS[indicator_code]} を取得中...")
+    sink を渡すと、レコードをページごとに sink に渡して手元には残さない。
+    省略した場合はレコードのリストを返す。
+    """
+    logger.debug("指標を取得中", extra={"country": country_code, "indicator": indicator_code})
 
+    collected = []
+    count = 0
     try:
-        async with session.get(url, params=params) as response:
-            if response.status == 200:
-                data = await response.json()
-                if data and data[1]:
-                    return [
-                        {
-                            "country": item["country"]["value"],
-                            "countryCode": item["countryiso3code"],
-                            "indicator": INDICATORS[indicator_code],
-                            "indicatorCode": indicator_code,
-                            "year": int(item["date"]),
-                            "value": item["value"],
-                            "unit": get_unit(indicator_code),
-                        }
-                        for item in data[1]
-                        if item["value"] is not None
-                    ]
+        async for records in iter_indicator_pages(
+            session, executor, country_code, indicator_code, **kwargs
+        ):
+            count += len(records)
+            if sink is None:
+                collected.extend(records)
+            else:
+                sink(records)
     except Exception as e:
-        print(f"  ❌ {country_code} - {indicator_code} の取得に失敗:", e)
-    return []
+        logger.debug(
+            "指標の取得に失敗",
+            extra={"country": country_code, "indicator": indicator_code, "error": str(e)},
+        )
+        if failures is not None:
+            failures.append((country_code, indicator_code, str(e)))
+        collected, count = [], 0
+    return collected if sink is None else count
 
 
 def get_unit(indicator_code):
@@ -93,61 +169,142 @@ def get_unit(indicator_code):
     return units.get(indicator_code, "")
 
 
-async def collect_all_data():
-    """全ての国と指標のデータを取得"""
+def all_series():
+    """全ての (国コード, 指標コード) の組み合わせを返す"""
+    return [
+        (country_code, indicator_code)
+        for country_code in COUNTRIES
+        for indicator_code in INDICATORS
+    ]
+
+
+class DatasetBuilder:
+    """取得したレコードを系列ごとに蓄積し、国別・指標別のデータを組み立てる
+
+    レコードは到着順に add で追加できる。国別・指標別の並びは到着順に
+    よらず (国, 指標) の定義順になるため、同じデータからは常に同じ
+    バージョンが計算される。
+    """
+
+    def __init__(self):
+        self.series = {}
+
+    def add(self, records):
+        for record in records:
+            key = (record["countryCode"], record["indicatorCode"])
+            self.series.setdefault(key, []).append(record)
+
+    def records(self):
+        """全レコードを (国, 指標) の定義順に返す"""
+        known = set(all_series())
+        ordered = [key for key in all_series() if key in self.series]
+        ordered += sorted(key for key in self.series if key not in known)
+        return [record for key in ordered for record in self.series[key]]
+
+    def organize(self):
+        """データを国別・指標別に整理"""
+        years = [record["year"] for items in self.series.values() for record in items]
+        organized = {
+            "byCountry": {},
+            "byIndicator": {},
+            "summary": {
+                "totalRecords": len(years),
+                "countries": list(COUNTRIES.keys()),
+                "indicators": list(INDICATORS.keys()),
+                "yearRange": {
+                    "min": min(years) if years else 0,
+                    "max": max(years) if years else 0,
+                },
+                "lastUpdated": datetime.now().isoformat(),
+            },
+        }
+
+        for country_code in COUNTRIES:
+            organized["byCountry"][country_code] = {
+                "name": COUNTRIES[country_code],
+                "data": [
+                    record
+                    for indicator_code in INDICATORS
+                    for record in self.series.get((country_code, indicator_code), [])
+                ],
+            }
+
+        for indicator_code in INDICATORS:
+            organized["byIndicator"][indicator_code] = {
+                "name": INDICATORS[indicator_code],
+                "data": [
+                    record
+                    for country_code in COUNTRIES
+                    for record in self.series.get((country_code, indicator_code), [])
+                ],
+            }
+
+        return organized
+
+
+@timed_stage
+async def collect_all_data(series=None, failures=None, sink=None):
+    """全ての国と指標のデータを取得（series で取得する系列を限定できる）
+
+    sink を渡すと、各系列のレコードを取得・解析が終わった順に sink に渡し、
+    取得件数を返す。省略した場合は全レコードのリストを返す。
+    """
     all_data = []
-    countries = list(COUNTRIES.keys())
-    indicators = list(INDICATORS.keys())
-
-    print(f"📊 {len(countries)}カ国 × {len(indicators)}指標のデータを取得開始...")
-
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for country_code in countries:
-            print(f"🌍 {COUNTRIES[country_code]} のデータを取得中...")
-            for indicator_code in indicators:
-                tasks.append(
-                    fetch_indicator_data(session, country_code, indicator_code)
+    series = all_series() if series is None else series
+    collect = sink is None
+    sink = all_data.extend if collect else sink
+
+    failures = [] if failures is None else failures
+    started = time.perf_counter()
+    logger.info("データ取得開始", extra={"series": len(series)})
+
+    empty_series = 0
+    records = 0
+    # エグゼキュータは更新処理を実行しているスレッドで作る。gevent ワーカーでは
+    # threading が patch されており、別のスレッドで作ったものをこのイベントループから
+    # 使うとハブの不一致で待ち続けてしまう
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="wb-parse") as executor:
+        async with aiohttp.ClientSession() as session:
+            tasks = [
+                fetch_indicator_data(
+                    session, executor, country_code, indicator_code, failures=failures, sink=sink
                 )
-        results = await asyncio.gather(*tasks)
-        for result in results:
-            all_data.extend(result)
+                for country_code, indicator_code in series
+            ]
+            for task in asyncio.as_completed(tasks):
+                count = await task
+                records += count
+                empty_series += count == 0
+
+    summary = {
+        "series": len(tasks),
+        "emptySeries": empty_series - len(failures),
+        "failedSeries": len(failures),
+        "records": records,
+        "elapsedMs": round((time.perf_counter() - started) * 1000),
+    }
+    logger.info("データ取得完了", extra=summary)
+    if failures:
+        logger.warning(
+            "一部の系列の取得に失敗",
+            extra={
+                "failedSeries": len(failures),
+                "sample": [f"{c}/{i}: {e}" for c, i, e in failures[:FAILURE_SAMPLE_SIZE]],
+            },
+        )
 
-    return all_data
+    return all_data if collect else records
 
 
+@timed_stage
 def organize_data(raw_data):
     """データを国別・指標別に整理"""
-    organized = {
-        "byCountry": {},
-        "byIndicator": {},
-        "summary": {
-            "totalRecords": len(raw_data),
-            "countries": list(COUNTRIES.keys()),
-            "indicators": list(INDICATORS.keys()),
-            "yearRange": {
-                "min": min(d["year"] for d in raw_data) if raw_data else 0,
-                "max": max(d["year"] for d in raw_data) if raw_data else 0,
-            },
-            "lastUpdated": datetime.now().isoformat(),
-        },
-    }
-
-    for country_code in COUNTRIES:
-        organized["byCountry"][country_code] = {
-            "name": COUNTRIES[country_code],
-            "data": [d for d in raw_data if d["countryCode"] == country_code],
-        }
-
-    for indicator_code in INDICATORS:
-        organized["byIndicator"][indicator_code] = {
-            "name": INDICATORS[indicator_code],
-            "data": [d for d in raw_data if d["indicatorCode"] == indicator_code],
-        }
-
-    return organized
+    builder = DatasetBuilder()
+    builder.add(raw_data)
+    return builder.organize()
 
 
+@timed_stage
 def save_data(data, filename):
     """データをファイルに保存"""
     try:
@@ -158,42 +315,81 @@ def save_data(data, filename):
         with open(file_path, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
-        print(f"💾 データを保存しました: {filename}")
+        logger.debug("データを保存しました", extra={"file": filename})
 
     except Exception as error:
-        print(f"❌ データ保存に失敗: {filename}", error)
+        logger.error("データ保存に失敗", extra={"file": filename, "error": str(error)})
         raise error
 
 
-async def collect_data():
-    """メイン関数：データ収集の実行"""
+def carry_over_series(previous_data, series_keys, stale=False):
+    """前回のデータから指定した系列のレコードを引き継ぐ"""
+    records = []
+    for country in (previous_data.get("byCountry") or {}).values():
+        for record in country["data"]:
+            if (record["countryCode"], record["indicatorCode"]) in series_keys:
+                records.append({**record, "stale": True} if stale else record)
+    return records
+
+
+async def collect_data(previous_data=None, series=None):
+    """メイン関数：データ収集の実行
+
+    previous_data に前回公開したデータを渡すと、取得に失敗した系列は
+    そこから補って stale として印を付ける。series を指定した場合は
+    その系列のみを取得し、それ以外は previous_data から引き継ぐ。
+    """
     try:
-        print("🚀 World Bank データ収集開始...")
+        logger.info("World Bank データ収集開始")
 
-        raw_data = await collect_all_data()
+        failures = []
+        requested = all_series() if series is None else series
+        # 取得できた系列から順にそのまま蓄積する
+        builder = DatasetBuilder()
+        fetched = await collect_all_data(requested, failures, sink=builder.add)
 
-        if not raw_data:
+        if not fetched and (series is None or len(failures) == len(requested)):
             raise Exception("データが取得できませんでした")
 
-        organized_data = organize_data(raw_data)
+        failed_keys = {(country_code, indicator_code) for country_code, indicator_code, _ in failures}
+        for key in failed_keys:
+            # 途中のページで失敗した系列の取得済み分は使わない
+            builder.series.pop(key, None)
+        if previous_data:
+            if series is not None:
+                kept_keys = set(all_series()) - set(series)
+                builder.add(carry_over_series(previous_data, kept_keys))
+            builder.add(carry_over_series(previous_data, failed_keys, stale=True))
+        stale_keys = {key for key, records in builder.series.items() if records[0].get("stale")}
+
+        organized_data = builder.organize()
+        raw_data = builder.records()
+        # 前回のデータで補った系列と、再取得が必要な系列
+        organized_data["summary"]["staleSeries"] = sorted([list(key) for key in stale_keys])
+        organized_data["summary"]["failedSeries"] = sorted([list(key) for key in failed_keys])
 
         # JSON形式で保存するように修正
         save_data(raw_data, "raw-data.json")
         save_data(organized_data, "organized-data.json")
         save_data(organized_data, "economic-data.json")
 
-        print(f"✅ データ収集完了: {len(raw_data)}件のレコードを取得")
-        print(
-            f"📅 期間: {organized_data['summary']['yearRange']['min']}-{organized_data['summary']['yearRange']['max']}"
+        logger.info(
+            "データ収集完了",
+            extra={
+                "records": len(raw_data),
+                "yearMin": organized_data["summary"]["yearRange"]["min"],
+                "yearMax": organized_data["summary"]["yearRange"]["max"],
+            },
         )
 
         return organized_data
 
     except Exception as error:
-        print("❌ データ収集でエラーが発生:", error)
+        logger.error("データ収集でエラーが発生", extra={"error": str(error)})
         raise error
 
 
 if __name__ == "__main__":
+    setup_logging()
     asyncio.run(collect_data())
 
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# 収集済みデータの保存先（data_collector.save_data と同じ場所）
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+# Flaskが配信している静的ファイルのディレクトリ
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+# 公開のたびに書き出すバージョンと分析結果。他のワーカープロセスは
+# この更新時刻が変わったら保存済みのデータを読み直す
+PUBLISHED_PATH = os.path.join(DATA_DIR, "published.json")
+# 他のプロセスによる公開を確認する間隔（秒）
+RELOAD_CHECK_SECONDS = 1.0
+
+_lock = threading.Lock()
+_snapshot = None
+_listeners = []
+# 現在のスナップショットの元になった PUBLISHED_PATH の更新時刻
+_published_mtime = None
+_next_reload_check = 0.0
+
+
+def compute_version(economic_data):
+    """国別データの内容からデータセットのバージョン文字列を計算"""
+    # lastUpdated は毎回変わるため、実データ部分のみをハッシュ化する
+    payload = json.dumps(
+        economic_data.get("byCountry") or {}, sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def _read_json(file_path):
+    """JSONファイルを読み込む（存在しなければNone）"""
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _make_snapshot(economic_data, analysis):
+    return {
+        "version": compute_version(economic_data),
+        "economic_data": economic_data,
+        "analysis": analysis or {},
+        "published_at": datetime.now().isoformat(),
+    }
+
+
+def _published_mtime_on_disk():
+    try:
+        return os.path.getmtime(PUBLISHED_PATH)
+    except OSError:
+        return None
+
+
+def _load_initial_snapshot():
+    """起動時に保存済みのデータからスナップショットを復元"""
+    economic_data = _read_json(os.path.join(DATA_DIR, "organized-data.json"))
+    if economic_data is None:
+        economic_data = _read_json(os.path.join(STATIC_DIR, "organized-data.json"))
+    if economic_data is None:
+        return None
+    published = _read_json(PUBLISHED_PATH)
+    if published is not None:
+        analysis = published["analysis"]
+    else:
+        analysis = _read_json(os.path.join(STATIC_DIR, "ai-analysis.json"))
+    return _make_snapshot(economic_data, analysis)
+
+
+def _reload_if_published_elsewhere():
+    """他のプロセスが新しいデータを公開していれば読み直す"""
+    global _next_reload_check, _published_mtime
+    now = time.monotonic()
+    if now < _next_reload_check:
+        return
+    _next_reload_check = now + RELOAD_CHECK_SECONDS
+    mtime = _published_mtime_on_disk()
+    if mtime is None or mtime == _published_mtime:
+        return
+    published = _read_json(PUBLISHED_PATH)
+    try:
+        economic_data = _read_json(os.path.join(DATA_DIR, "organized-data.json"))
+    except ValueError:
+        economic_data = None
+    if published is None or economic_data is None or compute_version(economic_data) != published["version"]:
+        # 次の更新がデータを書き込み中なので、次回の確認で読み直す
+        return
+    _published_mtime = mtime
+    _replace_snapshot(_make_snapshot(economic_data, published["analysis"]))
+
+
+def get_snapshot():
+    """現在公開中のスナップショットを返す（未公開ならNone）"""
+    global _snapshot, _published_mtime
+    if _snapshot is None:
+        with _lock:
+            if _snapshot is None:
+                _published_mtime = _published_mtime_on_disk()
+                _snapshot = _load_initial_snapshot()
+    else:
+        _reload_if_published_elsewhere()
+    return _snapshot
+
+
+def get_version():
+    """現在公開中のデータセットのバージョンを返す"""
+    snapshot = get_snapshot()
+    return snapshot["version"] if snapshot else None
+
+
+def add_listener(callback):
+    """新しいバージョンが公開されたときに呼ばれるコールバックを登録"""
+    _listeners.append(callback)
+
+
+def _replace_snapshot(snapshot):
+    """スナップショットを差し替え、バージョンが変わったらリスナーに通知する"""
+    global _snapshot
+    with _lock:
+        previous, _snapshot = _snapshot, snapshot
+    changed = previous is None or snapshot["version"] != previous["version"]
+    if changed:
+        for callback in list(_listeners):
+            callback(snapshot)
+    return changed
+
+
+def _write_published(snapshot):
+    """公開したバージョンと分析結果を書き出す（他のワーカープロセスへの通知）"""
+    global _published_mtime
+    os.makedirs(DATA_DIR, exist_ok=True)
+    temp_path = f"{PUBLISHED_PATH}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": snapshot["version"], "analysis": snapshot["analysis"]},
+            f,
+            ensure_ascii=False,
+        )
+    os.replace(temp_path, PUBLISHED_PATH)
+    _published_mtime = _published_mtime_on_disk()
+
+
+def publish_snapshot(economic_data, analysis):
+    """新しいデータを公開し、(スナップショット, バージョンが変わったか) を返す
+
+    economic_data は data_collector.save_data で保存済みであること。
+    """
+    get_snapshot()
+    snapshot = _make_snapshot(economic_data, analysis)
+    changed = _replace_snapshot(snapshot)
+    _write_published(snapshot)
+    return snapshot, changed
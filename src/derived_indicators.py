@@ -0,0 +1,390 @@
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from src.compact_format import iter_records
+from src.data_collector import INDICATORS
+from src.forecasting import build_series_matrix, forecast_matrix
+from src.rankings import build_record_index
+from src.structured_logging import get_logger
+
+logger = get_logger("derived")
+
+# 派生指標の定義（DERIVED_INDICATORS_PATH のJSONで追加・上書きできる）
+#   式では指標コード、数値、+ - * / と括弧、国をまたぐ集計関数が使える
+#     sum(x)     : 国の合計
+#     avg(x)     : 国の単純平均
+#     wavg(x, w) : w で重み付けした国の平均（例: 人口加重平均）
+#   集計関数を含む式の結果は GROUP_CODE の1系列になる
+DERIVED_INDICATORS = {
+    "DRV.GC.DPT.TOTL.CD": {
+        "name": "政府債務（米ドル）",
+        "unit": "米ドル",
+        "expression": "GC.DPT.TOTL.GD.ZS * NY.GDP.MKTP.CD / 100",
+    },
+    "DRV.BX.KLT.DINV.GD.ZS": {
+        "name": "外国直接投資（GDP比%）",
+        "unit": "%",
+        "expression": "BX.KLT.DINV.CD.WD / NY.GDP.MKTP.CD * 100",
+    },
+    "DRV.FP.CPI.TOTL.ZG.PW": {
+        "name": "インフレ率（人口加重平均、%）",
+        "unit": "%",
+        "expression": "wavg(FP.CPI.TOTL.ZG, SP.POP.TOTL)",
+    },
+    "DRV.NY.GDP.PCAP.CD.PW": {
+        "name": "一人当たりGDP（人口加重平均、米ドル）",
+        "unit": "米ドル",
+        "expression": "wavg(NY.GDP.PCAP.CD, SP.POP.TOTL)",
+    },
+}
+DERIVED_INDICATORS_PATH = os.environ.get("DERIVED_INDICATORS_PATH")
+
+# 集計結果の系列に使う国コード
+GROUP_CODE = "GRP"
+GROUP_NAME = "対象国全体"
+
+# 関数名 -> 引数の数
+FUNCTIONS = {"sum": 1, "avg": 1, "wavg": 2}
+
+_TOKEN_PATTERN = re.compile(r"\s*(?:(\d+(?:\.\d*)?)|([A-Za-z_][A-Za-z0-9_.]*)|(\S))")
+
+_lock = threading.Lock()
+_definitions = None
+_cached = None
+
+
+class ExpressionError(ValueError):
+    """派生指標の式が不正"""
+
+
+def _tokenize(expression):
+    tokens = []
+    for number, name, symbol in _TOKEN_PATTERN.findall(expression):
+        if number:
+            tokens.append(("num", float(number)))
+        elif name:
+            tokens.append(("name", name))
+        elif symbol:
+            if symbol not in "+-*/(),":
+                raise ExpressionError(f"使用できない文字です: {symbol}")
+            tokens.append(("op", symbol))
+    return tokens
+
+
+class _Parser:
+    """四則演算と関数呼び出しの再帰下降パーサー
+
+    構文木はタプルで表す: ("num", 値) / ("ref", 指標コード) / ("neg", 式)
+    / ("bin", 演算子, 左, 右) / ("call", 関数名, [引数])
+    """
+
+    def __init__(self, expression):
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _expect(self, symbol):
+        if self._next() != ("op", symbol):
+            raise ExpressionError(f"'{symbol}' が必要です")
+
+    def parse(self):
+        node = self._expression()
+        if self.pos != len(self.tokens):
+            raise ExpressionError(f"式の末尾が不正です: {self._peek()[1]}")
+        return node
+
+    def _expression(self):
+        node = self._term()
+        while self._peek() in (("op", "+"), ("op", "-")):
+            node = ("bin", self._next()[1], node, self._term())
+        return node
+
+    def _term(self):
+        node = self._factor()
+        while self._peek() in (("op", "*"), ("op", "/")):
+            node = ("bin", self._next()[1], node, self._factor())
+        return node
+
+    def _factor(self):
+        kind, value = self._next()
+        if (kind, value) == ("op", "-"):
+            return ("neg", self._factor())
+        if (kind, value) == ("op", "("):
+            node = self._expression()
+            self._expect(")")
+            return node
+        if kind == "num":
+            return ("num", value)
+        if kind == "name":
+            if self._peek() != ("op", "("):
+                return ("ref", value)
+            self._next()
+            args = [self._expression()]
+            while self._peek() == ("op", ","):
+                self._next()
+                args.append(self._expression())
+            self._expect(")")
+            if FUNCTIONS.get(value) != len(args):
+                raise ExpressionError(f"不明な関数、または引数の数が不正です: {value}")
+            return ("call", value, args)
+        raise ExpressionError("式が途中で終わっています" if kind is None else f"不正なトークンです: {value}")
+
+
+def parse_expression(expression):
+    """式を構文木に変換"""
+    return _Parser(expression).parse()
+
+
+def references(node):
+    """構文木が参照している指標コードを返す"""
+    if node[0] == "ref":
+        return {node[1]}
+    if node[0] == "neg":
+        return references(node[1])
+    if node[0] == "bin":
+        return references(node[2]) | references(node[3])
+    if node[0] == "call":
+        return set().union(*(references(arg) for arg in node[2]))
+    return set()
+
+
+def _is_aggregate(node, definitions):
+    """式の結果が国をまたいだ1系列（集計）になるか判定"""
+    kind = node[0]
+    if kind in ("num", "call"):
+        return True
+    if kind == "ref":
+        return node[1] in definitions and _is_aggregate(definitions[node[1]]["tree"], definitions)
+    if kind == "neg":
+        return _is_aggregate(node[1], definitions)
+    return _is_aggregate(node[2], definitions) and _is_aggregate(node[3], definitions)
+
+
+def _find_cycles(definitions):
+    """派生指標同士の循環参照に含まれるコードを返す"""
+    cyclic, visiting, done = set(), [], set()
+
+    def visit(code):
+        if code in done or code not in definitions:
+            return
+        if code in visiting:
+            cyclic.update(visiting[visiting.index(code):])
+            return
+        visiting.append(code)
+        for ref in definitions[code]["refs"]:
+            visit(ref)
+        visiting.pop()
+        done.add(code)
+
+    for code in definitions:
+        visit(code)
+    return cyclic
+
+
+def load_definitions():
+    """派生指標の定義を読み込み、式を構文解析（不正な定義はログに残して除外）"""
+    raw = dict(DERIVED_INDICATORS)
+    if DERIVED_INDICATORS_PATH and os.path.exists(DERIVED_INDICATORS_PATH):
+        with open(DERIVED_INDICATORS_PATH, "r", encoding="utf-8") as f:
+            raw.update(json.load(f))
+
+    definitions = {}
+    for code, definition in raw.items():
+        try:
+            if code in INDICATORS:
+                raise ExpressionError("取得対象の指標と同じコードは使えません")
+            tree = parse_expression(definition["expression"])
+            unknown = references(tree) - set(INDICATORS) - set(raw)
+            if unknown:
+                raise ExpressionError(f"不明な指標コードです: {', '.join(sorted(unknown))}")
+        except (ExpressionError, KeyError) as e:
+            logger.error("派生指標の定義が不正です", extra={"indicator": code, "error": str(e)})
+            continue
+        definitions[code] = {
+            "name": definition.get("name", code),
+            "unit": definition.get("unit", ""),
+            "expression": definition["expression"],
+            "tree": tree,
+            "refs": references(tree),
+        }
+
+    # 循環参照している定義と、除外された定義を参照している定義も除外する
+    for code in _find_cycles(definitions):
+        logger.error("派生指標が循環参照しています", extra={"indicator": code})
+        del definitions[code]
+    removed = True
+    while removed:
+        removed = [code for code, d in definitions.items() if d["refs"] - set(INDICATORS) - set(definitions)]
+        for code in removed:
+            logger.error("派生指標の参照先が不正です", extra={"indicator": code})
+            del definitions[code]
+    for definition in definitions.values():
+        definition["aggregate"] = _is_aggregate(definition["tree"], definitions)
+    return definitions
+
+
+def _aggregate(name, values, weights=None):
+    """国をまたいで集計し、(1 × 年) の行列を返す"""
+    if weights is None:
+        weights = np.ones_like(values)
+    values, weights = np.broadcast_arrays(values, weights)
+    mask = ~np.isnan(values) & ~np.isnan(weights)
+    weighted = np.where(mask, values * weights, 0.0).sum(axis=0)
+    if name == "sum":
+        total = weighted
+    else:
+        denominator = np.where(mask, weights, 0.0).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            total = weighted / denominator
+    return np.where(mask.any(axis=0), total, np.nan)[None, :]
+
+
+class _Evaluator:
+    """1つのデータセットのバージョンに対する派生指標の評価器
+
+    取得済みの指標を (国 × 年) の行列に整列しておき、派生指標は要求された
+    ときに初めて評価して結果を保持する（参照先の派生指標も同様）。
+    """
+
+    def __init__(self, economic_data, definitions):
+        self.definitions = definitions
+        records = list(iter_records(economic_data))
+        # 取得済みの指標のレコードと同じ国名（World Bank の表記）を使う
+        self.country_names = {record["countryCode"]: record["country"] for record in records}
+        keys, self.years, matrix = build_series_matrix(records)
+        self.countries = sorted({country for country, _ in keys})
+        position = {code: i for i, code in enumerate(self.countries)}
+
+        self.native = {}
+        for row, (country, indicator) in enumerate(keys):
+            if indicator not in self.native:
+                self.native[indicator] = np.full((len(self.countries), len(self.years)), np.nan)
+            self.native[indicator][position[country]] = matrix[row]
+        self.results = {}
+        self.rankings = {}
+        self.forecasts = {}
+        # 派生指標が別の派生指標を参照すると評価中に matrix() が再入するため RLock
+        self.lock = threading.RLock()
+
+    def matrix(self, code):
+        """指標の (国 × 年) の行列（集計結果は 1 × 年）を返す"""
+        if code in self.definitions:
+            result = self.results.get(code)
+            if result is None:
+                with self.lock:
+                    result = self.results.get(code)
+                    if result is None:
+                        result = self._evaluate(self.definitions[code]["tree"])
+                        result = np.where(np.isfinite(result), result, np.nan)
+                        self.results[code] = result
+            return result
+        return self.native.get(code, np.full((len(self.countries), len(self.years)), np.nan))
+
+    def ranking_index(self, code):
+        """派生指標の (指標コード, 年) -> ランキングの索引を返す"""
+        index = self.rankings.get(code)
+        if index is None:
+            index, _ = build_record_index(self.records(code))
+            self.rankings[code] = index
+        return index
+
+    def forecast(self, code):
+        """派生指標の欠損補間と予測を forecasting.compute_forecasts と同じ形式で返す"""
+        result = self.forecasts.get(code)
+        if result is None:
+            row_codes = [GROUP_CODE] if self.definitions[code]["aggregate"] else self.countries
+            keys = [(country, code) for country in row_codes]
+            result = forecast_matrix(keys, self.years, self.matrix(code))
+            self.forecasts[code] = result
+        return result
+
+    def _evaluate(self, node):
+        kind = node[0]
+        if kind == "num":
+            return np.full((1, len(self.years)), node[1])
+        if kind == "ref":
+            return self.matrix(node[1])
+        if kind == "neg":
+            return -self._evaluate(node[1])
+        if kind == "bin":
+            left, right = self._evaluate(node[2]), self._evaluate(node[3])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                if node[1] == "+":
+                    return left + right
+                if node[1] == "-":
+                    return left - right
+                if node[1] == "*":
+                    return left * right
+                return left / right
+        args = [self._evaluate(arg) for arg in node[2]]
+        return _aggregate(node[1], *args)
+
+    def records(self, code):
+        """派生指標を取得済みの指標と同じ形式のレコードで返す"""
+        definition = self.definitions[code]
+        matrix = self.matrix(code)
+        row_codes = [GROUP_CODE] if definition["aggregate"] else self.countries
+        rows, columns = np.nonzero(~np.isnan(matrix))
+        return [
+            {
+                "country": GROUP_NAME if row_codes[row] == GROUP_CODE else self.country_names.get(row_codes[row], row_codes[row]),
+                "countryCode": row_codes[row],
+                "indicator": definition["name"],
+                "indicatorCode": code,
+                "year": int(self.years[column]),
+                "value": float(matrix[row, column]),
+                "unit": definition["unit"],
+            }
+            for row, column in zip(rows, columns)
+        ]
+
+
+def get_definitions():
+    """読み込み済みの派生指標の定義を返す"""
+    global _definitions
+    if _definitions is None:
+        with _lock:
+            if _definitions is None:
+                _definitions = load_definitions()
+    return _definitions
+
+
+def list_definitions():
+    """派生指標の定義（コード -> 名前・単位・式・集計か）を返す"""
+    return {
+        code: {
+            "name": d["name"],
+            "unit": d["unit"],
+            "expression": d["expression"],
+            "aggregate": d["aggregate"],
+        }
+        for code, d in get_definitions().items()
+    }
+
+
+def is_derived(code):
+    return code in get_definitions()
+
+
+def get_evaluator(snapshot):
+    """データセットのバージョン単位でキャッシュした評価器を返す"""
+    global _cached
+    cached = _cached
+    if cached is not None and cached[0] == snapshot["version"]:
+        return cached[1]
+    definitions = get_definitions()
+    with _lock:
+        if _cached is None or _cached[0] != snapshot["version"]:
+            _cached = (snapshot["version"], _Evaluator(snapshot["economic_data"], definitions))
+        return _cached[1]
@@ -0,0 +1,79 @@
+import json
+import threading
+from collections import deque
+
+# Server-Sent Events の配信
+#
+# 購読者ごとにキューを持たず、全購読者で1つのリングバッファを共有する。
+# publish_event はフレームを一度だけ整形してバッファに積み、待機中の購読者を
+# まとめて起こすだけなので、購読者数に関係なくコストは一定になる。
+# 購読者は Condition 上で待機する。gunicorn.conf.py の gevent ワーカーでは
+# threading が monkey patch されるため、アイドル中の接続はグリーンレット1つで済む。
+# 開発用サーバー（python -m src.main）では接続ごとにスレッドを1つ占有する。
+
+# 再接続時に再送できるイベントの件数
+HISTORY_SIZE = 256
+# アイドル接続を維持するためのコメント送信間隔（秒）
+KEEPALIVE_SECONDS = 15.0
+# ブラウザの再接続待ち時間（ミリ秒）
+RETRY_MILLISECONDS = 5000
+
+_condition = threading.Condition()
+_events = deque(maxlen=HISTORY_SIZE)
+_latest_id = 0
+_subscriber_count = 0
+
+
+def format_event(event, data, event_id=None):
+    """SSEのフレーム文字列を生成"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def publish_event(event, data):
+    """全購読者にイベントを配信"""
+    global _latest_id
+    with _condition:
+        _latest_id += 1
+        _events.append((_latest_id, format_event(event, data, _latest_id)))
+        _condition.notify_all()
+    return _latest_id
+
+
+def get_subscriber_count():
+    """現在接続中の購読者数を返す"""
+    return _subscriber_count
+
+
+def _pending_events(cursor):
+    return [(event_id, frame) for event_id, frame in _events if event_id > cursor]
+
+
+def stream_events(last_event_id=None, initial_frames=()):
+    """購読者1人分のSSEストリームを生成するジェネレータ"""
+    global _subscriber_count
+    with _condition:
+        # サーバー再起動でIDが巻き戻った場合は最新位置から購読する
+        cursor = _latest_id if last_event_id is None else min(last_event_id, _latest_id)
+        _subscriber_count += 1
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        for frame in initial_frames:
+            yield frame
+        while True:
+            with _condition:
+                _condition.wait_for(lambda: _latest_id > cursor, KEEPALIVE_SECONDS)
+                pending = _pending_events(cursor)
+            if not pending:
+                yield ": keepalive\n\n"
+                continue
+            for _, frame in pending:
+                yield frame
+            cursor = pending[-1][0]
+    finally:
+        with _condition:
+            _subscriber_count -= 1
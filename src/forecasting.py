@@ -0,0 +1,171 @@
+import threading
+
+import numpy as np
+
+from src.compact_format import iter_records
+
+# 予測手法
+FORECAST_METHODS = ("linear", "holt")
+# 予測期間（年）
+DEFAULT_HORIZON = 5
+MAX_HORIZON = 10
+# 線形トレンドの推定に使う直近の年数
+TREND_WINDOW = 10
+# Holtの線形指数平滑化のパラメータ
+HOLT_ALPHA = 0.5
+HOLT_BETA = 0.3
+
+_lock = threading.Lock()
+_cached = None
+
+
+def build_series_matrix(records):
+    """レコードを (系列 × 年) の行列に整列（欠損は NaN）"""
+    records = list(records)
+    keys = sorted({(r["countryCode"], r["indicatorCode"]) for r in records})
+    if not keys:
+        return keys, np.arange(0), np.empty((0, 0))
+
+    key_index = {key: i for i, key in enumerate(keys)}
+    rows = np.fromiter(
+        (key_index[(r["countryCode"], r["indicatorCode"])] for r in records),
+        dtype=np.intp, count=len(records),
+    )
+    record_years = np.fromiter((r["year"] for r in records), dtype=np.intp, count=len(records))
+    values = np.fromiter(
+        (np.nan if r["value"] is None else r["value"] for r in records),
+        dtype=float, count=len(records),
+    )
+
+    years = np.arange(record_years.min(), record_years.max() + 1)
+    matrix = np.full((len(keys), len(years)), np.nan)
+    matrix[rows, record_years - years[0]] = values
+    return keys, years, matrix
+
+
+def fill_gaps(matrix):
+    """系列内部の欠損年を線形補間し、(補間後の行列, 補間したセルのマスク) を返す"""
+    n_series, n_years = matrix.shape
+    valid = ~np.isnan(matrix)
+    idx = np.arange(n_years)
+
+    # 各セルから見た直前・直後の観測値の位置
+    prev_idx = np.maximum.accumulate(np.where(valid, idx, -1), axis=1)
+    next_idx = np.minimum.accumulate(np.where(valid, idx, n_years)[:, ::-1], axis=1)[:, ::-1]
+    interior = ~valid & (prev_idx >= 0) & (next_idx < n_years)
+
+    rows = np.arange(n_series)[:, None]
+    prev_val = matrix[rows, np.clip(prev_idx, 0, n_years - 1)]
+    next_val = matrix[rows, np.clip(next_idx, 0, n_years - 1)]
+    span = np.maximum(next_idx - prev_idx, 1)
+    weight = (idx - prev_idx) / span
+
+    filled = np.where(interior, prev_val + (next_val - prev_val) * weight, matrix)
+    return filled, interior
+
+
+def last_observed_index(matrix):
+    """各系列の最後の観測値の列インデックス（観測値なしは -1）"""
+    valid = ~np.isnan(matrix)
+    reversed_first = np.argmax(valid[:, ::-1], axis=1)
+    return np.where(valid.any(axis=1), matrix.shape[1] - 1 - reversed_first, -1)
+
+
+def linear_trend_forecast(filled, last_idx, horizon, window=TREND_WINDOW):
+    """直近 window 年の最小二乗直線を全系列まとめて当てはめて外挿"""
+    idx = np.arange(filled.shape[1], dtype=float)
+    in_window = (idx <= last_idx[:, None]) & (idx > (last_idx - window)[:, None])
+    mask = in_window & ~np.isnan(filled)
+    y = np.where(mask, filled, 0.0)
+    x = np.where(mask, idx, 0.0)
+
+    n = mask.sum(axis=1)
+    sx, sy = x.sum(axis=1), y.sum(axis=1)
+    sxx, sxy = (x * x).sum(axis=1), (x * y).sum(axis=1)
+    denom = n * sxx - sx * sx
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denom > 0, (n * sxy - sx * sy) / np.where(denom > 0, denom, 1), 0.0)
+        intercept = np.where(n > 0, (sy - slope * sx) / np.maximum(n, 1), np.nan)
+
+    steps = last_idx[:, None] + np.arange(1, horizon + 1)
+    return intercept[:, None] + slope[:, None] * steps
+
+
+def holt_forecast(filled, horizon, alpha=HOLT_ALPHA, beta=HOLT_BETA):
+    """Holtの線形指数平滑化を全系列まとめて計算して外挿"""
+    n_series = filled.shape[0]
+    level = np.full(n_series, np.nan)
+    trend = np.zeros(n_series)
+
+    for column in filled.T:
+        observed = ~np.isnan(column)
+        start = observed & np.isnan(level)
+        level[start] = column[start]
+
+        update = observed & ~start
+        previous_level = level[update]
+        level[update] = alpha * column[update] + (1 - alpha) * (previous_level + trend[update])
+        trend[update] = beta * (level[update] - previous_level) + (1 - beta) * trend[update]
+
+    return level[:, None] + trend[:, None] * np.arange(1, horizon + 1)
+
+
+def compute_forecasts(economic_data, horizon=MAX_HORIZON):
+    """全系列の欠損補間と予測をまとめて計算"""
+    keys, years, matrix = build_series_matrix(iter_records(economic_data))
+    return forecast_matrix(keys, years, matrix, horizon)
+
+
+def forecast_matrix(keys, years, matrix, horizon=MAX_HORIZON):
+    """(系列 × 年) の行列の欠損補間と予測をまとめて計算（keys は各行の (国, 指標)）"""
+    filled, imputed = fill_gaps(matrix)
+    last_idx = last_observed_index(matrix)
+    return {
+        "keys": keys,
+        "key_index": {key: i for i, key in enumerate(keys)},
+        "years": years,
+        "filled": filled,
+        "imputed": imputed,
+        "last_idx": last_idx,
+        "forecasts": {
+            "linear": linear_trend_forecast(filled, last_idx, horizon),
+            "holt": holt_forecast(filled, horizon),
+        },
+    }
+
+
+def get_forecasts(snapshot):
+    """データセットのバージョン単位でキャッシュした予測結果を返す"""
+    global _cached
+    cached = _cached
+    if cached is not None and cached[0] == snapshot["version"]:
+        return cached[1]
+    with _lock:
+        if _cached is None or _cached[0] != snapshot["version"]:
+            _cached = (snapshot["version"], compute_forecasts(snapshot["economic_data"]))
+        return _cached[1]
+
+
+def _to_list(row):
+    return [None if np.isnan(value) else float(value) for value in row]
+
+
+def series_forecast(result, country_code, indicator_code, method="holt", horizon=DEFAULT_HORIZON):
+    """1系列分の補間済み実績と予測値を返す（系列がなければNone）"""
+    i = result["key_index"].get((country_code, indicator_code))
+    if i is None:
+        return None
+    last = int(result["last_idx"][i])
+    if last < 0:
+        return None
+    start_year = int(result["years"][0])
+    return {
+        "country": country_code,
+        "indicator": indicator_code,
+        "startYear": start_year,
+        "values": _to_list(result["filled"][i, : last + 1]),
+        "imputed": result["imputed"][i, : last + 1].tolist(),
+        "forecastStartYear": start_year + last + 1,
+        "forecast": _to_list(result["forecasts"][method][i, :horizon]),
+    }
@@ -2,6 +2,10 @@
 import asyncio
 from typing import Any, Dict
 
+from src.structured_logging import get_logger
+
+logger = get_logger("analyzer")
+
 # AI分析機能を無効化するためのダミーモジュール
 
 def initialize_gemini():
@@ -10,7 +14,7 @@ def initialize_gemini():
 
 async def analyze_data(economic_data: Dict[str, Any]) -> Dict[str, Any]:
     """AI分析をスキップし、ダミーの分析結果を返す"""
-    print("🤖 Gemini AI分析は無効化されています。ダミーの結果を返します。")
+    logger.info("Gemini AI分析は無効化されています。ダミーの結果を返します。")
     
     # ダミーの概要分析
     overview = {
@@ -0,0 +1,240 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from src.data_collector import COUNTRIES, INDICATORS
+
+# 再現するトラフィックの構成: (分類, 重み, メソッド, パス)
+#   パス中の {country} と {indicator} はリクエストごとにランダムに埋める
+SCENARIO = [
+    ("page", 20, "GET", "/"),
+    ("page", 5, "GET", "/countries/{country}"),
+    ("page", 5, "GET", "/indicators/{indicator}"),
+    ("static", 15, "GET", "/static/style.css"),
+    ("static", 15, "GET", "/static/script.js"),
+    ("data", 10, "GET", "/api/data?format=compact"),
+    ("data", 8, "GET", "/api/data/countries/{country}"),
+    ("data", 8, "GET", "/api/data/indicators/{indicator}"),
+    ("data", 6, "GET", "/api/rankings?indicator={indicator}&country={country}"),
+    ("data", 5, "GET", "/api/forecast?indicator={indicator}&horizon=3"),
+    ("data", 4, "GET", "/api/catalog/search?q=gdp"),
+    ("update", 1, "POST", "/api/update"),
+]
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, p):
+    """ソート済みの値の p パーセンタイル（最近傍順位法）"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def build_scenario(update_weight=None):
+    """シナリオを (エントリのリスト, 重みのリスト) にする（update_weight で更新の重みを上書き）"""
+    entries = []
+    for category, weight, method, path in SCENARIO:
+        if category == "update" and update_weight is not None:
+            weight = update_weight
+        if weight > 0:
+            entries.append(((category, method, path), weight))
+    return [entry for entry, _ in entries], [weight for _, weight in entries]
+
+
+def _fill_path(path, rng):
+    return path.format(
+        country=rng.choice(list(COUNTRIES)),
+        indicator=rng.choice(list(INDICATORS)),
+    )
+
+
+class InProcessClient:
+    """Flaskのテストクライアントでアプリを直接呼び出す（スレッドごとに1つ）"""
+
+    def __init__(self):
+        from src.main import app
+
+        self.client = app.test_client()
+
+    def request(self, method, path):
+        response = self.client.open(path, method=method, headers={"Accept-Encoding": "gzip"})
+        response.get_data()
+        response.close()
+        return response.status_code
+
+
+class HttpClient:
+    """起動中のインスタンスにHTTPでリクエストする"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def request(self, method, path):
+        request = urllib.request.Request(
+            self.base_url + path,
+            method=method,
+            headers={"Accept-Encoding": "gzip"},
+            data=b"" if method == "POST" else None,
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+def _worker(make_client, entries, weights, deadline, remaining, seed):
+    """締め切りまで（または総リクエスト数に達するまで）リクエストを送り続ける"""
+    rng = random.Random(seed)
+    client = make_client()
+    samples = []
+    while time.perf_counter() < deadline:
+        if remaining is not None:
+            with remaining["lock"]:
+                if remaining["count"] <= 0:
+                    break
+                remaining["count"] -= 1
+        category, method, path = rng.choices(entries, weights)[0]
+        started = time.perf_counter()
+        try:
+            status = client.request(method, _fill_path(path, rng))
+        except Exception:
+            status = None
+        samples.append((category, status, (time.perf_counter() - started) * 1000))
+    return samples
+
+
+def run_load_test(
+    url=None,
+    concurrency=10,
+    duration=30.0,
+    requests=None,
+    update_weight=None,
+    timeout=30.0,
+    seed=None,
+):
+    """負荷試験を実行し、分類ごとのスループットとレイテンシを集計して返す"""
+    entries, weights = build_scenario(update_weight)
+    if url:
+        def make_client():
+            return HttpClient(url, timeout)
+    else:
+        # アプリの初期化（データの読み込みなど）は計測に含めない
+        InProcessClient()
+        make_client = InProcessClient
+
+    seed = random.randrange(2**32) if seed is None else seed
+    remaining = {"count": requests, "lock": threading.Lock()} if requests else None
+    started = time.perf_counter()
+    deadline = started + (duration if not requests else float("inf"))
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="loadtest") as executor:
+        futures = [
+            executor.submit(_worker, make_client, entries, weights, deadline, remaining, seed + i)
+            for i in range(concurrency)
+        ]
+        samples = [sample for future in futures for sample in future.result()]
+    elapsed = time.perf_counter() - started
+
+    def summarize(items):
+        latencies = sorted(latency for _, _, latency in items)
+        statuses = {}
+        for _, status, _ in items:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = sum(1 for _, status, _ in items if status is None or status >= 500)
+        return {
+            "requests": len(items),
+            "errors": errors,
+            "throughput": round(len(items) / elapsed, 1) if elapsed else 0,
+            "statuses": statuses,
+            **{f"p{p}Ms": _round(percentile(latencies, p)) for p in PERCENTILES},
+            "maxMs": _round(latencies[-1] if latencies else None),
+        }
+
+    categories = sorted({category for category, _, _ in samples})
+    return {
+        "target": url or "in-process",
+        "concurrency": concurrency,
+        "elapsedSeconds": round(elapsed, 2),
+        "seed": seed,
+        "total": summarize(samples),
+        "byCategory": {
+            category: summarize([s for s in samples if s[0] == category]) for category in categories
+        },
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+def format_report(report):
+    """集計結果を表形式の文字列にする"""
+    header = f"{'分類':<8}{'件数':>8}{'エラー':>8}{'req/s':>10}" + "".join(
+        f"{f'p{p}(ms)':>10}" for p in PERCENTILES
+    ) + f"{'max(ms)':>10}"
+    lines = [
+        f"対象: {report['target']}  並列数: {report['concurrency']}  "
+        f"経過: {report['elapsedSeconds']}秒  seed: {report['seed']}",
+        header,
+    ]
+    rows = list(report["byCategory"].items()) + [("total", report["total"])]
+    for name, stats in rows:
+        lines.append(
+            f"{name:<8}{stats['requests']:>8}{stats['errors']:>8}{stats['throughput']:>10}"
+            + "".join(f"{str(stats[f'p{p}Ms']):>10}" for p in PERCENTILES)
+            + f"{str(stats['maxMs']):>10}"
+        )
+    lines.append("ステータス: " + ", ".join(f"{k}={v}" for k, v in sorted(report["total"]["statuses"].items())))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ダッシュボードの負荷試験")
+    parser.add_argument("--url", help="対象のURL（省略時はプロセス内でアプリを直接呼び出す）")
+    parser.add_argument("--concurrency", type=int, default=10, help="同時に実行する仮想ユーザー数")
+    parser.add_argument("--duration", type=float, default=30.0, help="実行時間（秒）")
+    parser.add_argument("--requests", type=int, help="総リクエスト数（指定時は --duration より優先）")
+    parser.add_argument("--update-weight", type=float, help="更新リクエストの重み（0で更新しない）")
+    parser.add_argument("--timeout", type=float, default=30.0, help="HTTPのタイムアウト（秒）")
+    parser.add_argument("--seed", type=int, help="リクエストの選択に使う乱数の種")
+    parser.add_argument("--json", action="store_true", help="結果をJSONで出力")
+    parser.add_argument("--max-p95-ms", type=float, help="p95がこの値を超えたら終了コード1")
+    parser.add_argument("--max-error-rate", type=float, help="エラー率（0〜1）がこの値を超えたら終了コード1")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(
+        url=args.url,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        requests=args.requests,
+        update_weight=args.update_weight,
+        timeout=args.timeout,
+        seed=args.seed,
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+    total = report["total"]
+    failed = False
+    if args.max_p95_ms is not None and (total["p95Ms"] or 0) > args.max_p95_ms:
+        print(f"p95 {total['p95Ms']}ms が上限 {args.max_p95_ms}ms を超えました", file=sys.stderr)
+        failed = True
+    if args.max_error_rate is not None and total["requests"]:
+        error_rate = total["errors"] / total["requests"]
+        if error_rate > args.max_error_rate:
+            print(f"エラー率 {error_rate:.3f} が上限 {args.max_error_rate} を超えました", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,17 @@
 
 import os
-from flask import Flask, send_from_directory
+import threading
+from flask import Flask, Response, send_from_directory
 from flask_cors import CORS
+from src.dashboard_generator import render_served_index
+from src.dataset_store import get_snapshot
 from src.routes.api import api_bp
+from src.profiling import init_app as init_profiling
+from src.scheduler import start_scheduler
+from src.structured_logging import setup_logging
+
+# ログはキュー経由でバックグラウンドスレッドが書き出す
+setup_logging()
 
 # Flaskアプリケーションのインスタンスを作成
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
@@ -14,6 +23,35 @@ CORS(app)
 # APIブループリントを登録
 app.register_blueprint(api_bp, url_prefix='/api')
 
+# リクエスト単位のプロファイル（X-Profile ヘッダー、遅い処理の自動保存）
+init_profiling(app)
+
+# 定期更新（REFRESH_INTERVAL_MINUTES を設定した場合のみ）。
+# python -m src.main ではリローダーの監視プロセスもこのモジュールを実行するが、
+# リクエストを処理するのは WERKZEUG_RUN_MAIN が設定された子プロセスだけなので、
+# そちらでのみ起動する
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    start_scheduler()
+
+_index_lock = threading.Lock()
+# (バージョン, index.html の更新時刻) -> 埋め込み済みのHTML
+_index_cache = {}
+
+def _served_index(index_path):
+    """公開中のバージョンのSVGと国別カードを埋め込んだ index.html を返す"""
+    snapshot = get_snapshot()
+    key = (snapshot["version"] if snapshot else None, os.path.getmtime(index_path))
+    html = _index_cache.get(key)
+    if html is None:
+        with _index_lock:
+            html = _index_cache.get(key)
+            if html is None:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    html = render_served_index(f.read(), snapshot)
+                _index_cache.clear()
+                _index_cache[key] = html
+    return Response(html, mimetype="text/html")
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
@@ -21,12 +59,16 @@ def serve(path):
     if static_folder_path is None:
         return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+    if path not in ("", "index.html") and os.path.exists(os.path.join(static_folder_path, path)):
         return send_from_directory(static_folder_path, path)
+    elif path != "" and os.path.exists(os.path.join(static_folder_path, path + ".html")):
+        # 国別・指標別の静的ページへのディープリンク（例: /countries/JPN）
+        return send_from_directory(static_folder_path, path + ".html")
     else:
         index_path = os.path.join(static_folder_path, 'index.html')
         if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+            # JS実行前に表示するSVGと国別カードを埋め込んで返す
+            return _served_index(index_path)
         else:
             return "index.html not found", 404
 
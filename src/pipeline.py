@@ -0,0 +1,169 @@
+import asyncio
+import threading
+import time
+
+from src.background import run_in_thread
+from src.data_collector import collect_data
+from src.gemini_analyzer import analyze_data
+from src.dashboard_generator import generate_dashboard
+from src.dataset_store import add_listener, get_snapshot, publish_snapshot
+from src.event_stream import publish_event
+from src.profiling import pipeline_profiling_requested, profile, stage as profile_stage
+from src.rankings import get_ranking_index
+from src.structured_logging import get_logger
+
+logger = get_logger("pipeline")
+
+# 取得に失敗した系列を再取得するまでの待ち時間（秒）。試行ごとに次の値を使う
+RETRY_DELAYS = (60, 300, 900)
+
+# 更新処理は同時に1つだけ実行する
+refresh_lock = threading.Lock()
+# 再取得の予約ごとに増やす（待機中の古い予約を無効にするため）
+_retry_generation = 0
+# 予約中の再取得の対象（None は全系列、空なら予約なし）
+_retry_series = []
+
+
+def _stage(stage, status, **extra):
+    """パイプラインの進捗イベントを配信"""
+    publish_event("stage", {"stage": stage, "status": status, **extra})
+
+
+def _announce_version(snapshot):
+    """新しいバージョンの公開を配信（他のワーカーの公開を読み直した場合も）"""
+    publish_event(
+        "version",
+        {
+            "version": snapshot["version"],
+            "lastUpdated": snapshot["economic_data"]["summary"]["lastUpdated"],
+        },
+    )
+
+
+add_listener(_announce_version)
+
+
+async def run_refresh(profile_run=False, series=None, attempt=0):
+    """データ収集→AI分析→ダッシュボード生成→公開を実行
+
+    series を指定すると、その系列のみを再取得して公開中のデータに反映する。
+    取得に失敗した系列は前回のデータで補い、後で失敗した系列のみを再試行する。
+    """
+    if series is None:
+        _cancel_retry()
+    use_cprofile = profile_run or pipeline_profiling_requested()
+    with profile("pipeline", "run_refresh", use_cprofile=use_cprofile):
+        try:
+            snapshot = await _run_stages(series)
+        except Exception:
+            # 公開中のスナップショットはそのまま配信を続け、同じ系列を後で再試行する
+            _schedule_retry(series, attempt)
+            raise
+
+    failed = snapshot["economic_data"]["summary"].get("failedSeries") or []
+    if failed:
+        _schedule_retry([tuple(key) for key in failed], attempt)
+    return snapshot
+
+
+async def _run_stages(series=None):
+    stage = "collect"
+    try:
+        _stage(stage, "started")
+        previous = get_snapshot()
+        with profile_stage(stage):
+            economic_data = await collect_data(
+                previous["economic_data"] if previous else None, series
+            )
+        summary = economic_data["summary"]
+        _stage(
+            stage,
+            "completed",
+            records=summary["totalRecords"],
+            staleSeries=len(summary["staleSeries"]),
+        )
+
+        stage = "analyze"
+        _stage(stage, "started")
+        with profile_stage(stage):
+            analysis_results = await analyze_data(economic_data)
+        _stage(stage, "completed")
+
+        stage = "generate"
+        _stage(stage, "started")
+        with profile_stage(stage):
+            generate_dashboard(economic_data, analysis_results)
+        _stage(stage, "completed")
+
+        stage = "publish"
+        with profile_stage(stage):
+            snapshot, changed = publish_snapshot(economic_data, analysis_results)
+            # ランキング索引は値が変わった指標・年のみ再構築される
+            get_ranking_index(snapshot)
+        _stage(stage, "completed", version=snapshot["version"], changed=changed)
+        return snapshot
+
+    except Exception as e:
+        _stage(stage, "failed", error=str(e))
+        raise
+
+
+def _cancel_retry():
+    global _retry_generation, _retry_series
+    _retry_generation += 1
+    _retry_series = []
+
+
+def _schedule_retry(series, attempt):
+    """失敗した系列の再取得を予約（試行回数の上限に達したら諦める）
+
+    既に予約中の系列があれば、それも合わせて再取得する。
+    """
+    global _retry_series
+    if attempt >= len(RETRY_DELAYS):
+        logger.warning("再試行の上限に達しました", extra={"attempts": attempt})
+        return
+    if series is not None and _retry_series is not None:
+        series = sorted(set(_retry_series) | set(series))
+    else:
+        series = None
+    _cancel_retry()
+    _retry_series = series
+    generation = _retry_generation
+    delay = RETRY_DELAYS[attempt]
+
+    def wait_and_retry():
+        global _retry_series
+        time.sleep(delay)
+        # 待機中に全体更新が始まった、または別の再取得が予約された
+        if generation != _retry_generation:
+            return
+        _retry_series = []
+        if not refresh_in_background(series=series, attempt=attempt + 1):
+            # 他の更新が実行中なので、試行回数を進めずに待ち直す
+            logger.info("更新の実行中のため再取得を延期します", extra={"attempts": attempt})
+            _schedule_retry(series, attempt)
+
+    run_in_thread(wait_and_retry, "dashboard-retry")
+    logger.info(
+        "再取得を予約しました",
+        extra={"series": "all" if series is None else len(series), "delaySeconds": delay},
+    )
+
+
+def refresh_in_background(**kwargs):
+    """更新をバックグラウンドスレッドで実行（既に実行中ならFalseを返す）"""
+    if not refresh_lock.acquire(blocking=False):
+        return False
+
+    def worker():
+        try:
+            asyncio.run(run_refresh(**kwargs))
+        except Exception as e:
+            logger.error("バックグラウンド更新に失敗", extra={"error": str(e)})
+        finally:
+            refresh_lock.release()
+
+    run_in_thread(worker, "dashboard-refresh")
+    return True
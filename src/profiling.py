@@ -0,0 +1,293 @@
+import cProfile
+import contextvars
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import g, request
+
+from src.background import run_in_thread
+from src.structured_logging import get_logger
+
+logger = get_logger("profiling")
+
+# プロファイルの保存先
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "profiles")
+# 保持するプロファイルの最大件数
+MAX_PROFILES = 50
+# プロファイル結果に含める関数の件数
+TOP_FUNCTIONS = 30
+# リクエスト単位でプロファイルを要求するヘッダー
+PROFILE_HEADER = "X-Profile"
+# 計測しないパス（プロファイルの閲覧で保存済みのプロファイルが押し出されないように）
+UNPROFILED_PATHS = ("/api/profiles",)
+
+_config = {
+    # X-Profile ヘッダーによる計測を有効にする
+    "enabled": os.environ.get("PROFILING_ENABLED") == "1",
+    # これ以上かかったリクエスト・パイプラインのステージ内訳を自動保存する（0で無効）
+    "slow_ms": float(os.environ.get("PROFILE_SLOW_MS", "0")),
+    # パイプライン実行を常に cProfile で計測する
+    "pipeline": os.environ.get("PROFILE_PIPELINE") == "1",
+}
+
+_current = contextvars.ContextVar("profile_session", default=None)
+_save_lock = threading.Lock()
+
+
+def configure(**options):
+    """プロファイル設定を変更（enabled, slow_ms, pipeline）"""
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise ValueError(f"不明なプロファイル設定です: {', '.join(sorted(unknown))}")
+    _config.update(options)
+
+
+def is_enabled():
+    return _config["enabled"]
+
+
+def pipeline_profiling_requested():
+    return _config["pipeline"]
+
+
+def profiles_available():
+    """プロファイルを保存する設定がいずれか有効か（閲覧APIの公開条件）"""
+    return _config["enabled"] or _config["slow_ms"] > 0 or _config["pipeline"]
+
+
+def start_session(kind, name, use_cprofile=False):
+    """プロファイルセッションを開始（不要な場合はNoneを返す）"""
+    if _current.get() is not None:
+        return None
+    if not use_cprofile and _config["slow_ms"] <= 0:
+        return None
+
+    session = {
+        "kind": kind,
+        "name": name,
+        "stages": [],
+        "thread": threading.get_ident(),
+        "profiler": cProfile.Profile() if use_cprofile else None,
+        "extraProfilers": [],
+        "start": time.perf_counter(),
+    }
+    session["token"] = _current.set(session)
+    if session["profiler"] is not None:
+        session["profiler"].enable()
+    return session
+
+
+def finish_session(session):
+    """セッションを終了し、保存した場合はプロファイルIDを返す"""
+    if session["profiler"] is not None:
+        session["profiler"].disable()
+    _current.reset(session["token"])
+
+    total_ms = (time.perf_counter() - session["start"]) * 1000
+    slow = _config["slow_ms"] > 0 and total_ms >= _config["slow_ms"]
+    if session["profiler"] is None and not slow:
+        return None
+    return _save_profile(session, total_ms, slow)
+
+
+@contextmanager
+def profile(kind, name, use_cprofile=False):
+    """処理全体をプロファイルするコンテキストマネージャ"""
+    parent = _current.get()
+    if parent is not None:
+        # 入れ子の場合は親セッションの1ステージとして記録する
+        with stage(name), _thread_profiler(parent):
+            yield parent
+        return
+
+    session = start_session(kind, name, use_cprofile)
+    if session is None:
+        yield None
+        return
+    try:
+        yield session
+    finally:
+        finish_session(session)
+
+
+@contextmanager
+def _thread_profiler(session):
+    """親セッションと別スレッドで実行される処理（async ビューなど）も cProfile で計測"""
+    if session["profiler"] is None or session["thread"] == threading.get_ident():
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # 他のプロファイラが有効な場合は計測しない
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        session["extraProfilers"].append(profiler)
+
+
+@contextmanager
+def stage(name):
+    """実行中のセッションにステージの所要時間を記録"""
+    session = _current.get()
+    if session is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        session["stages"].append({
+            "name": name,
+            "offsetMs": round((start - session["start"]) * 1000, 3),
+            "durationMs": round((time.perf_counter() - start) * 1000, 3),
+        })
+
+
+def timed_stage(func):
+    """関数の実行をステージとして記録するデコレータ（無効時はほぼコストなし）"""
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return await func(*args, **kwargs)
+            with stage(func.__name__):
+                return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current.get() is None:
+            return func(*args, **kwargs)
+        with stage(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _top_functions(session):
+    stats = pstats.Stats(session["profiler"], stream=io.StringIO())
+    for profiler in session["extraProfilers"]:
+        stats.add(profiler)
+    stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    return stats, stats.stream.getvalue()
+
+
+def _save_profile(session, total_ms, slow):
+    """プロファイルIDを割り当て、保存はバックグラウンドで行う"""
+    profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{session['kind']}-{uuid.uuid4().hex[:6]}"
+    meta = {
+        "id": profile_id,
+        "kind": session["kind"],
+        "name": session["name"],
+        "createdAt": datetime.now().isoformat(),
+        "totalMs": round(total_ms, 3),
+        "slow": slow,
+        "stages": session["stages"],
+        "hasProfile": session["profiler"] is not None,
+    }
+    run_in_thread(_write_profile, "profile-writer", session, meta)
+    return profile_id
+
+
+def _write_profile(session, meta):
+    """プロファイルとステージ内訳を書き出す（リクエストの応答を待たせない）"""
+    try:
+        with _save_lock:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            if session["profiler"] is not None:
+                stats, summary = _top_functions(session)
+                stats.dump_stats(os.path.join(PROFILE_DIR, f"{meta['id']}.prof"))
+                meta["topFunctions"] = summary
+            with open(os.path.join(PROFILE_DIR, f"{meta['id']}.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            _prune_profiles()
+    except Exception as e:
+        logger.error("プロファイルの保存に失敗", extra={"profileId": meta["id"], "error": str(e)})
+        return
+
+    logger.info(
+        "プロファイルを保存しました",
+        extra={"profileId": meta["id"], "totalMs": round(meta["totalMs"], 1), "slow": meta["slow"]},
+    )
+
+
+def _prune_profiles():
+    """古いプロファイルを削除して MAX_PROFILES 件に保つ
+
+    IDは作成日時で始まるため、ファイルを読まずにファイル名の順で判断する。
+    """
+    profile_ids = sorted(
+        {os.path.splitext(name)[0] for name in os.listdir(PROFILE_DIR) if name.endswith(".json")},
+        reverse=True,
+    )
+    for profile_id in profile_ids[MAX_PROFILES:]:
+        for extension in (".json", ".prof"):
+            path = os.path.join(PROFILE_DIR, profile_id + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_profiles():
+    """保存済みプロファイルの概要を新しい順に返す"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for filename in os.listdir(PROFILE_DIR):
+        if filename.endswith(".json"):
+            with open(os.path.join(PROFILE_DIR, filename), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            meta.pop("topFunctions", None)
+            profiles.append(meta)
+    return sorted(profiles, key=lambda p: p["createdAt"], reverse=True)
+
+
+def load_profile(profile_id):
+    """プロファイルの詳細を返す（存在しなければNone）"""
+    path = os.path.join(PROFILE_DIR, f"{os.path.basename(profile_id)}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def init_app(app):
+    """リクエスト単位のプロファイルフックを登録"""
+
+    @app.before_request
+    def _start_request_profile():
+        if request.path.startswith(UNPROFILED_PATHS):
+            return
+        use_cprofile = _config["enabled"] and request.headers.get(PROFILE_HEADER) == "1"
+        g.profile_session = start_session("request", f"{request.method} {request.path}", use_cprofile)
+
+    @app.after_request
+    def _finish_request_profile(response):
+        session = g.pop("profile_session", None)
+        if session is not None:
+            profile_id = finish_session(session)
+            if profile_id:
+                response.headers["X-Profile-Id"] = profile_id
+        return response
+
+    @app.teardown_request
+    def _discard_request_profile(exc):
+        # 例外で after_request が呼ばれなかった場合もセッションを閉じる
+        session = g.pop("profile_session", None)
+        if session is not None:
+            finish_session(session)
@@ -0,0 +1,99 @@
+import threading
+from bisect import bisect_right
+
+from src.compact_format import iter_records
+
+_lock = threading.Lock()
+_index_version = None
+# (指標コード, 年) -> ランキングのエントリ
+_index = {}
+
+
+def _build_entry(values_by_country):
+    """1つの指標・年についてソート済みのランキングを作成"""
+    ordered = sorted(values_by_country.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "byCountry": values_by_country,
+        # 降順の国コード（上位N・下位Nの取得用）
+        "countries": [code for code, _ in ordered],
+        # 昇順の値（順位・パーセンタイルの二分探索用）
+        "sortedValues": [value for _, value in reversed(ordered)],
+    }
+
+
+def build_ranking_index(economic_data, previous=None):
+    """指標・年ごとのランキング索引を作成（値が変わらない年は前回の結果を再利用）"""
+    return build_record_index(iter_records(economic_data), previous)
+
+
+def build_record_index(records, previous=None):
+    """レコードからランキング索引を作成し、(索引, 作り直したエントリ数) を返す"""
+    buckets = {}
+    for record in records:
+        if record["value"] is None:
+            continue
+        key = (record["indicatorCode"], record["year"])
+        buckets.setdefault(key, {})[record["countryCode"]] = record["value"]
+
+    previous = previous or {}
+    index = {}
+    rebuilt = 0
+    for key, values_by_country in buckets.items():
+        entry = previous.get(key)
+        if entry is None or entry["byCountry"] != values_by_country:
+            entry = _build_entry(values_by_country)
+            rebuilt += 1
+        index[key] = entry
+    return index, rebuilt
+
+
+def get_ranking_index(snapshot):
+    """公開中のバージョンに対応するランキング索引を返す"""
+    global _index, _index_version
+    if _index_version == snapshot["version"]:
+        return _index
+    with _lock:
+        if _index_version != snapshot["version"]:
+            _index, _ = build_ranking_index(snapshot["economic_data"], _index)
+            _index_version = snapshot["version"]
+        return _index
+
+
+def latest_year(index, indicator_code):
+    """指標のランキングが存在する最新年を返す"""
+    years = [year for code, year in index if code == indicator_code]
+    return max(years) if years else None
+
+
+def top_n(entry, n):
+    """上位N件を返す"""
+    return [_ranked(entry, code) for code in entry["countries"][:n]]
+
+
+def bottom_n(entry, n):
+    """下位N件を最下位から順に返す"""
+    return [_ranked(entry, code) for code in reversed(entry["countries"][-n:])] if n else []
+
+
+def rank_of(entry, country_code):
+    """国の順位（値の大きい順、同値は同順位）を返す"""
+    value = entry["byCountry"].get(country_code)
+    if value is None:
+        return None
+    return len(entry["sortedValues"]) - bisect_right(entry["sortedValues"], value) + 1
+
+
+def percentile_of(entry, country_code):
+    """国の値以下の割合（%）を返す"""
+    value = entry["byCountry"].get(country_code)
+    if value is None:
+        return None
+    return bisect_right(entry["sortedValues"], value) / len(entry["sortedValues"]) * 100
+
+
+def _ranked(entry, country_code):
+    return {
+        "rank": rank_of(entry, country_code),
+        "country": country_code,
+        "value": entry["byCountry"][country_code],
+    }
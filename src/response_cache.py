@@ -0,0 +1,110 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+from src.dataset_store import add_listener, get_version
+
+# キャッシュするレスポンスの最大件数（クエリの組み合わせによる肥大化を防ぐ）
+MAX_ENTRIES = 512
+# 事前圧縮の圧縮レベル
+GZIP_LEVEL = 6
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_entries_version = None
+
+
+def clear_cache(snapshot=None):
+    """キャッシュを破棄（新しいバージョンの公開時に呼ばれる）"""
+    global _entries_version
+    with _lock:
+        _entries.clear()
+        _entries_version = snapshot["version"] if snapshot else None
+
+
+add_listener(clear_cache)
+
+
+def _cache_key():
+    """ルートとクエリ文字列からキャッシュキーを生成"""
+    return request.path, tuple(sorted(request.args.items(multi=True)))
+
+
+def _lookup(version, key):
+    with _lock:
+        if version != _entries_version:
+            return None
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+        return entry
+
+
+def _store(version, key, response):
+    """レスポンスを一度だけシリアライズ・圧縮してキャッシュに格納"""
+    global _entries_version
+    body = response.get_data()
+    digest = hashlib.sha1(body).hexdigest()[:16]
+    entry = {
+        "body": body,
+        "gzip": gzip.compress(body, GZIP_LEVEL),
+        "etag": f"{version}-{digest}",
+        "mimetype": response.mimetype,
+    }
+    with _lock:
+        if version != _entries_version:
+            _entries.clear()
+            _entries_version = version
+        _entries[key] = entry
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return entry
+
+
+def _respond(entry, cache_status):
+    """キャッシュエントリからレスポンスを生成（304・gzip対応）"""
+    use_gzip = "gzip" in request.accept_encodings
+    etag = entry["etag"] + ("-gz" if use_gzip else "")
+
+    if request.if_none_match.contains(entry["etag"]) or request.if_none_match.contains(
+        entry["etag"] + "-gz"
+    ):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(
+            entry["gzip"] if use_gzip else entry["body"], mimetype=entry["mimetype"]
+        )
+        if use_gzip:
+            response.headers["Content-Encoding"] = "gzip"
+
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["X-Cache"] = cache_status
+    return response
+
+
+def cached_response(view):
+    """データセットのバージョン単位でレスポンスをキャッシュするデコレータ"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = get_version()
+        if version is None:
+            return view(*args, **kwargs)
+
+        key = _cache_key()
+        entry = _lookup(version, key)
+        if entry is not None:
+            return _respond(entry, "HIT")
+
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+        return _respond(_store(version, key, response), "MISS")
+
+    return wrapper
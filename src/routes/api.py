@@ -1,8 +1,28 @@
-
-from flask import Blueprint, jsonify, request
-from src.data_collector import collect_data
-from src.gemini_analyzer import analyze_data
-from src.dashboard_generator import generate_dashboard
+import os
+from flask import Blueprint, Response, jsonify, request, send_from_directory
+from src.catalog import DEFAULT_LIMIT as CATALOG_DEFAULT_LIMIT, MAX_LIMIT as CATALOG_MAX_LIMIT, search as search_catalog
+from src.compact_format import encode_compact, iter_records
+from src.dataset_store import get_snapshot
+from src.derived_indicators import get_evaluator, is_derived, list_definitions
+from src.event_stream import format_event, stream_events
+from src.forecasting import (
+    DEFAULT_HORIZON,
+    FORECAST_METHODS,
+    MAX_HORIZON,
+    get_forecasts,
+    series_forecast,
+)
+from src.pipeline import refresh_in_background, refresh_lock, run_refresh
+from src.profiling import PROFILE_DIR, list_profiles, load_profile, profiles_available
+from src.rankings import (
+    bottom_n,
+    get_ranking_index,
+    latest_year,
+    percentile_of,
+    rank_of,
+    top_n,
+)
+from src.response_cache import cached_response
 
 api_bp = Blueprint("api", __name__)
 
@@ -12,23 +32,248 @@ def health_check():
 
 @api_bp.route("/update", methods=["POST"])
 async def update_dashboard():
-    try:
-        # データ収集
-        economic_data = await collect_data()
-
-        # AI分析（無効化）
-        # analysis_results = await analyze_data(economic_data)
-        analysis_results = await analyze_data(economic_data) # ダミー分析を呼び出す
+    # 公開中のデータがあれば、それを配信し続けたままバックグラウンドで更新する
+    # （進捗は /api/events で通知される。?wait=1 で完了まで待つ）
+    snapshot = get_snapshot()
+    if snapshot is not None and request.args.get("wait") != "1":
+        started = refresh_in_background()
+        return jsonify({
+            "status": "refreshing" if started else "alreadyRunning",
+            "version": snapshot["version"],
+        }), 202
 
-        # ダッシュボード生成
-        generate_dashboard(economic_data, analysis_results)
+    if not refresh_lock.acquire(blocking=False):
+        return jsonify({"error": "更新処理が実行中です"}), 409
+    try:
+        # データ収集・AI分析（ダミー）・ダッシュボード生成・公開
+        snapshot = await run_refresh()
 
         # 結果を返す
         return jsonify({
-            "economic_data": economic_data,
-            "analysis": analysis_results
+            "economic_data": snapshot["economic_data"],
+            "analysis": snapshot["analysis"],
+            "version": snapshot["version"],
         })
 
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        # 収集に失敗しても、前回公開したデータがあればそれを返す
+        last_good = get_snapshot()
+        if last_good is None:
+            return jsonify({"error": str(e)}), 500
+        return jsonify({
+            "economic_data": last_good["economic_data"],
+            "analysis": last_good["analysis"],
+            "version": last_good["version"],
+            "stale": True,
+            "error": str(e),
+        })
+    finally:
+        refresh_lock.release()
+
+@api_bp.route("/events", methods=["GET"])
+def events():
+    # 再接続時はブラウザが送ってくる Last-Event-ID 以降を再送する
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+
+    # 接続直後に現在のバージョンを通知する
+    snapshot = get_snapshot()
+    initial_frames = []
+    if snapshot:
+        initial_frames.append(format_event("version", {
+            "version": snapshot["version"],
+            "lastUpdated": snapshot["economic_data"].get("summary", {}).get("lastUpdated"),
+        }))
+
+    return Response(
+        stream_events(last_event_id, initial_frames),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _wants_compact():
+    """クライアントがコンパクト形式を要求しているか判定"""
+    return request.args.get("format") == "compact"
+
+def _current_snapshot():
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None, (jsonify({"error": "データがまだ収集されていません"}), 503)
+    return snapshot, None
+
+@api_bp.route("/data", methods=["GET"])
+@cached_response
+def get_data():
+    snapshot, error = _current_snapshot()
+    if error:
+        return error
+
+    economic_data = snapshot["economic_data"]
+    if _wants_compact():
+        return jsonify(encode_compact(
+            iter_records(economic_data),
+            summary=economic_data.get("summary"),
+            version=snapshot["version"],
+        ))
+    return jsonify({**economic_data, "version": snapshot["version"]})
+
+@api_bp.route("/data/countries/<country_code>", methods=["GET"])
+@cached_response
+def get_country_data(country_code):
+    snapshot, error = _current_snapshot()
+    if error:
+        return error
+
+    country = (snapshot["economic_data"].get("byCountry") or {}).get(country_code.upper())
+    if country is None:
+        return jsonify({"error": f"不明な国コードです: {country_code}"}), 404
+    if _wants_compact():
+        return jsonify(encode_compact(country["data"], version=snapshot["version"]))
+    return jsonify({**country, "version": snapshot["version"]})
+
+@api_bp.route("/data/indicators/<indicator_code>", methods=["GET"])
+@cached_response
+def get_indicator_data(indicator_code):
+    snapshot, error = _current_snapshot()
+    if error:
+        return error
+
+    indicator = (snapshot["economic_data"].get("byIndicator") or {}).get(indicator_code)
+    if indicator is None and is_derived(indicator_code):
+        # 派生指標は要求されたときに評価する（バージョン単位でキャッシュ）
+        indicator = {
+            **list_definitions()[indicator_code],
+            "data": get_evaluator(snapshot).records(indicator_code),
+        }
+    if indicator is None:
+        return jsonify({"error": f"不明な指標コードです: {indicator_code}"}), 404
+    if _wants_compact():
+        return jsonify(encode_compact(indicator["data"], version=snapshot["version"]))
+    return jsonify({**indicator, "version": snapshot["version"]})
+
+@api_bp.route("/derived", methods=["GET"])
+def get_derived_indicators():
+    return jsonify({"indicators": list_definitions()})
+
+@api_bp.route("/forecast", methods=["GET"])
+@cached_response
+def get_forecast():
+    snapshot, error = _current_snapshot()
+    if error:
+        return error
+
+    method = request.args.get("method", "holt")
+    if method not in FORECAST_METHODS:
+        return jsonify({"error": f"不明な予測手法です: {method}"}), 400
+    horizon = request.args.get("horizon", DEFAULT_HORIZON, type=int)
+    if not 1 <= horizon <= MAX_HORIZON:
+        return jsonify({"error": f"horizon は1〜{MAX_HORIZON}で指定してください"}), 400
+
+    indicator_code = request.args.get("indicator")
+    if indicator_code and is_derived(indicator_code):
+        result = get_evaluator(snapshot).forecast(indicator_code)
+    else:
+        result = get_forecasts(snapshot)
+    country_codes = request.args.get("countries")
+    selected_countries = set(country_codes.upper().split(",")) if country_codes else None
+
+    series = []
+    for country_code, code in result["keys"]:
+        if indicator_code and code != indicator_code:
+            continue
+        if selected_countries and country_code not in selected_countries:
+            continue
+        forecast = series_forecast(result, country_code, code, method, horizon)
+        if forecast:
+            series.append(forecast)
+
+    return jsonify({
+        "version": snapshot["version"],
+        "method": method,
+        "horizon": horizon,
+        "series": series,
+    })
+
+@api_bp.route("/rankings", methods=["GET"])
+@cached_response
+def get_rankings():
+    snapshot, error = _current_snapshot()
+    if error:
+        return error
+
+    indicator_code = request.args.get("indicator")
+    if not indicator_code:
+        return jsonify({"error": "indicator を指定してください"}), 400
+
+    if is_derived(indicator_code):
+        index = get_evaluator(snapshot).ranking_index(indicator_code)
+    else:
+        index = get_ranking_index(snapshot)
+    year = request.args.get("year", type=int) or latest_year(index, indicator_code)
+    entry = index.get((indicator_code, year))
+    if entry is None:
+        return jsonify({"error": f"ランキングがありません: {indicator_code} ({year})"}), 404
+
+    result = {
+        "version": snapshot["version"],
+        "indicator": indicator_code,
+        "year": year,
+        "count": len(entry["countries"]),
+    }
+    top = request.args.get("top", type=int)
+    bottom = request.args.get("bottom", type=int)
+    country_code = request.args.get("country")
+    if top is None and bottom is None and country_code is None:
+        top = 5
+    if top is not None:
+        result["top"] = top_n(entry, max(top, 0))
+    if bottom is not None:
+        result["bottom"] = bottom_n(entry, max(bottom, 0))
+    if country_code is not None:
+        country_code = country_code.upper()
+        rank = rank_of(entry, country_code)
+        if rank is None:
+            return jsonify({"error": f"{country_code} の {year} 年のデータがありません"}), 404
+        result["country"] = {
+            "country": country_code,
+            "value": entry["byCountry"][country_code],
+            "rank": rank,
+            "percentile": percentile_of(entry, country_code),
+        }
+    return jsonify(result)
+
+@api_bp.route("/profiles", methods=["GET"])
+def get_profiles():
+    if not profiles_available():
+        return jsonify({"error": "プロファイルは無効です"}), 404
+    return jsonify({"profiles": list_profiles()})
+
+@api_bp.route("/profiles/<profile_id>", methods=["GET"])
+def get_profile(profile_id):
+    profile = load_profile(profile_id) if profiles_available() else None
+    if profile is None:
+        return jsonify({"error": f"プロファイルが見つかりません: {profile_id}"}), 404
+    return jsonify(profile)
+
+@api_bp.route("/profiles/<profile_id>/download", methods=["GET"])
+def download_profile(profile_id):
+    profile = load_profile(profile_id) if profiles_available() else None
+    if profile is None or not profile["hasProfile"]:
+        return jsonify({"error": f"プロファイルが見つかりません: {profile_id}"}), 404
+    return send_from_directory(
+        os.path.abspath(PROFILE_DIR), f"{profile['id']}.prof", as_attachment=True
+    )
+
+@api_bp.route("/catalog/search", methods=["GET"])
+def catalog_search():
+    doc_type = request.args.get("type")
+    if doc_type not in (None, "indicator", "country"):
+        return jsonify({"error": f"不明な種類です: {doc_type}"}), 400
+    limit = min(max(request.args.get("limit", CATALOG_DEFAULT_LIMIT, type=int), 1), CATALOG_MAX_LIMIT)
 
+    results = search_catalog(
+        request.args.get("q", ""),
+        doc_type=doc_type,
+        topic=request.args.get("topic"),
+        limit=limit,
+    )
+    return jsonify({"results": results})
@@ -0,0 +1,162 @@
+import asyncio
+import fcntl
+import json
+import os
+import random
+import threading
+
+import aiohttp
+
+from src.background import run_in_thread
+from src.data_collector import BASE_URL, COUNTRIES, INDICATORS
+from src.dataset_store import get_snapshot
+from src.pipeline import refresh_lock, run_refresh
+from src.structured_logging import get_logger
+
+logger = get_logger("scheduler")
+
+# 更新間隔（分）。0 の場合はスケジューラを起動しない
+REFRESH_INTERVAL_MINUTES = float(os.environ.get("REFRESH_INTERVAL_MINUTES", "0"))
+# 実行時刻に加えるランダムな揺らぎの最大値（秒）
+REFRESH_JITTER_SECONDS = float(os.environ.get("REFRESH_JITTER_SECONDS", "300"))
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+# 複数ワーカーのうち1つだけがスケジューラを動かすためのロックファイル
+LOCK_PATH = os.path.join(DATA_DIR, "scheduler.lock")
+# 前回更新時点での各指標の lastupdated
+UPSTREAM_STATE_PATH = os.path.join(DATA_DIR, "upstream-state.json")
+
+_stop_event = threading.Event()
+_thread = None
+_lock_file = None
+
+
+def _acquire_leader_lock():
+    """ロックファイルを非ブロッキングで取得（他のワーカーが保持していればFalse）"""
+    global _lock_file
+    if _lock_file is not None:
+        return True
+    os.makedirs(DATA_DIR, exist_ok=True)
+    lock_file = open(LOCK_PATH, "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    _lock_file = lock_file
+    return True
+
+
+def load_upstream_state():
+    if not os.path.exists(UPSTREAM_STATE_PATH):
+        return {}
+    with open(UPSTREAM_STATE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_upstream_state(state):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(UPSTREAM_STATE_PATH, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+async def fetch_last_updated(session, indicator_code):
+    """指標の lastupdated をページのメタデータから取得（1件だけ要求する）"""
+    url = f"{BASE_URL}/country/{';'.join(COUNTRIES)}/indicator/{indicator_code}"
+    async with session.get(url, params={"format": "json", "per_page": 1}) as response:
+        response.raise_for_status()
+        data = await response.json(content_type=None)
+        return data[0].get("lastupdated") if data else None
+
+
+async def fetch_upstream_state():
+    """全指標の lastupdated を取得（取得できなかった指標はNone）"""
+    async with aiohttp.ClientSession() as session:
+        results = await asyncio.gather(
+            *(fetch_last_updated(session, code) for code in INDICATORS),
+            return_exceptions=True,
+        )
+    return {
+        code: None if isinstance(result, Exception) else result
+        for code, result in zip(INDICATORS, results)
+    }
+
+
+def changed_indicators(previous, current):
+    """前回から lastupdated が変わった（または確認できなかった）指標を返す"""
+    return [
+        code for code in INDICATORS
+        if current.get(code) is None or current.get(code) != previous.get(code)
+    ]
+
+
+async def run_scheduled_refresh():
+    """上流の更新を確認し、変わった指標のみを更新"""
+    previous = load_upstream_state()
+    current = await fetch_upstream_state()
+    changed = changed_indicators(previous, current)
+
+    if get_snapshot() is not None and not changed:
+        logger.info("上流データに変更がないため更新をスキップしました")
+        return None
+
+    series = None
+    if get_snapshot() is not None and len(changed) < len(INDICATORS):
+        series = [(country_code, code) for country_code in COUNTRIES for code in changed]
+    logger.info(
+        "定期更新を開始",
+        extra={"changedIndicators": len(changed), "series": "all" if series is None else len(series)},
+    )
+    snapshot = await run_refresh(series=series)
+
+    # 再取得に失敗した系列の指標は、次回も変更ありとして扱う
+    failed = {code for _, code in snapshot["economic_data"]["summary"].get("failedSeries") or []}
+    save_upstream_state({
+        code: value for code, value in current.items() if value is not None and code not in failed
+    })
+    return snapshot
+
+
+def _next_delay():
+    return REFRESH_INTERVAL_MINUTES * 60 + random.uniform(0, REFRESH_JITTER_SECONDS)
+
+
+def _scheduler_loop():
+    while not _stop_event.wait(_next_delay()):
+        if not _acquire_leader_lock():
+            logger.debug("他のワーカーがスケジューラを実行中です")
+            continue
+        if not refresh_lock.acquire(blocking=False):
+            logger.info("更新処理が実行中のため定期更新を見送りました")
+            continue
+        try:
+            asyncio.run(run_scheduled_refresh())
+        except Exception as e:
+            logger.error("定期更新に失敗", extra={"error": str(e)})
+        finally:
+            refresh_lock.release()
+
+
+def start_scheduler():
+    """定期更新のスレッドを起動（REFRESH_INTERVAL_MINUTES が0なら何もしない）"""
+    global _thread
+    if REFRESH_INTERVAL_MINUTES <= 0 or _thread is not None:
+        return False
+    _stop_event.clear()
+    _thread = run_in_thread(_scheduler_loop, "refresh-scheduler")
+    logger.info(
+        "スケジューラを起動しました",
+        extra={"intervalMinutes": REFRESH_INTERVAL_MINUTES, "jitterSeconds": REFRESH_JITTER_SECONDS},
+    )
+    return True
+
+
+def stop_scheduler():
+    """定期更新のスレッドを停止"""
+    global _thread
+    _stop_event.set()
+    if _thread is not None:
+        _thread()
+        _thread = None
@@ -33,6 +33,7 @@ document.addEventListener('DOMContentLoaded', async function() {
         renderCharts();
         setupEventListeners();
         updateDataTable(); // データテーブルの初期表示
+        subscribeToUpdates(); // 更新通知の購読
         
         console.log('✅ ダッシュボード初期化完了');
     } catch (error) {
@@ -36632,6 +36633,11 @@ function renderCountries() {
     }
     
     const countries = Object.entries(economicData.byCountry);
+    // サーバー側で生成したスパークラインの配信先（未生成なら空）
+    const svgBase = countriesGrid.dataset.svgBase;
+    const sparkline = (code, indicatorCode) => svgBase
+        ? `<img class="sparkline" src="${svgBase}/sparklines/${code}-${indicatorCode}.svg" alt="" width="120" height="32" loading="lazy">`
+        : '';
     
     countriesGrid.innerHTML = countries.map(([code, countryData]) => {
         const flag = countryFlags[code] || '🏳️';
@@ -36653,18 +36659,22 @@ function renderCountries() {
                     <div class="metric-item">
                         <div class="metric-label">GDP</div>
                         <div class="metric-value">${formatValue(latestGDP?.value, 'trillion')}</div>
+                        ${sparkline(code, 'NY.GDP.MKTP.CD')}
                     </div>
                     <div class="metric-item">
                         <div class="metric-label">成長率</div>
                         <div class="metric-value">${formatValue(latestGrowth?.value, 'percent')}</div>
+                        ${sparkline(code, 'NY.GDP.MKTP.KD.ZG')}
                     </div>
                     <div class="metric-item">
                         <div class="metric-label">失業率</div>
                         <div class="metric-value">${formatValue(latestUnemployment?.value, 'percent')}</div>
+                        ${sparkline(code, 'SL.UEM.TOTL.ZS')}
                     </div>
                     <div class="metric-item">
                         <div class="metric-label">インフレ率</div>
                         <div class="metric-value">${formatValue(latestInflation?.value, 'percent')}</div>
+                        ${sparkline(code, 'FP.CPI.TOTL.ZG')}
                     </div>
                 </div>
             </div>
@@ -36733,6 +36743,9 @@ function renderIndicatorTabs() {
 // チャートをレンダリング
 function renderCharts() {
     if (!economicData) return;
+
+    // サーバー側で描画したSVGを外してからChart.jsで描画する
+    document.querySelectorAll('.chart-fallback').forEach(img => img.remove());
     
     // 各チャートを初期化
     initializeGDPChart();
@@ -36743,6 +36756,82 @@ function renderCharts() {
     initializeTradeChart();
     initializePopulationChart();
     initializeFDIChart();
+
+    // 欠損年の補間値と予測値を重ねる
+    overlayForecasts();
+}
+
+// トレンドチャートに欠損補間と予測を重ねる
+async function overlayForecasts() {
+    const chartIndicators = {
+        gdpGrowthChart: 'NY.GDP.MKTP.KD.ZG',
+        inflationChart: 'FP.CPI.TOTL.ZG',
+        tradeChart: 'NE.TRD.GNFS.ZS',
+        populationChart: 'SP.POP.TOTL',
+        fdiChart: 'BX.KLT.DINV.CD.WD'
+    };
+
+    for (const [chartId, indicatorCode] of Object.entries(chartIndicators)) {
+        const chart = charts[chartId];
+        if (!chart) continue;
+
+        try {
+            const response = await fetch(`/api/forecast?indicator=${encodeURIComponent(indicatorCode)}&horizon=3`);
+            if (!response.ok) continue;
+            const result = await response.json();
+            applyForecast(chart, result.series);
+        } catch (error) {
+            console.warn('⚠️ 予測データの取得に失敗:', indicatorCode, error);
+        }
+    }
+}
+
+function applyForecast(chart, seriesList) {
+    const labels = chart.data.labels;
+    const seriesByCountry = Object.fromEntries(seriesList.map(s => [s.country, s]));
+
+    // 予測年をラベルに追加
+    for (const series of seriesList) {
+        series.forecast.forEach((_, i) => {
+            const year = series.forecastStartYear + i;
+            if (!labels.includes(year)) labels.push(year);
+        });
+    }
+    labels.sort((a, b) => a - b);
+
+    const forecastDatasets = [];
+    for (const dataset of chart.data.datasets) {
+        const series = seriesByCountry[dataset.countryCode];
+        if (!series) continue;
+
+        const lastYear = series.forecastStartYear - 1;
+        const valueAt = (year) => {
+            const i = year - series.startYear;
+            return i >= 0 && i < series.values.length ? series.values[i] : null;
+        };
+
+        // 欠損年を補間値で埋める
+        dataset.data = labels.map(year => valueAt(year));
+
+        forecastDatasets.push({
+            label: `${dataset.label}（予測）`,
+            countryCode: dataset.countryCode,
+            data: labels.map(year => {
+                if (year === lastYear) return valueAt(year);
+                const i = year - series.forecastStartYear;
+                return i >= 0 && i < series.forecast.length ? series.forecast[i] : null;
+            }),
+            borderColor: dataset.borderColor,
+            backgroundColor: dataset.backgroundColor,
+            borderWidth: 2,
+            borderDash: [6, 4],
+            pointRadius: 0,
+            fill: false
+        });
+    }
+
+    chart.data.datasets.push(...forecastDatasets);
+    chart.update();
 }
 
 // GDP比較チャート
@@ -36829,6 +36918,7 @@ function initializeGDPGrowthChart() {
         
         return {
             label: countryData.name,
+            countryCode: code,
             data: data,
             borderColor: colors[index],
             backgroundColor: colors[index] + '20',
@@ -36837,7 +36927,7 @@ function initializeGDPGrowthChart() {
         };
     }).filter(Boolean);
     
-    new Chart(ctx, {
+    charts[ctx.id] = new Chart(ctx, {
         type: 'line',
         data: {
             labels: years,
@@ -36994,6 +37084,7 @@ function initializeInflationChart() {
         
         return {
             label: countryData.name,
+            countryCode: code,
             data: data,
             borderColor: colors[index],
             backgroundColor: colors[index] + '20',
@@ -37002,7 +37093,7 @@ function initializeInflationChart() {
         };
     }).filter(Boolean);
     
-    new Chart(ctx, {
+    charts[ctx.id] = new Chart(ctx, {
         type: 'line',
         data: {
             labels: years,
@@ -37045,6 +37136,7 @@ function initializeTradeChart() {
         
         return {
             label: countryData.name,
+            countryCode: code,
             data: data,
             borderColor: colors[index],
             backgroundColor: colors[index] + '20',
@@ -37053,7 +37145,7 @@ function initializeTradeChart() {
         };
     }).filter(Boolean);
     
-    new Chart(ctx, {
+    charts[ctx.id] = new Chart(ctx, {
         type: 'line',
         data: {
             labels: years,
@@ -37102,6 +37194,7 @@ function initializePopulationChart() {
         
         return {
             label: countryData.name,
+            countryCode: code,
             data: data,
             borderColor: colors[index],
             backgroundColor: colors[index] + '20',
@@ -37110,7 +37203,7 @@ function initializePopulationChart() {
         };
     }).filter(Boolean);
     
-    new Chart(ctx, {
+    charts[ctx.id] = new Chart(ctx, {
         type: 'line',
         data: {
             labels: years,
@@ -37154,6 +37247,7 @@ function initializeFDIChart() {
         
         return {
             label: countryData.name,
+            countryCode: code,
             data: data,
             borderColor: colors[index],
             backgroundColor: colors[index] + '20',
@@ -37162,7 +37256,7 @@ function initializeFDIChart() {
         };
     }).filter(Boolean);
     
-    new Chart(ctx, {
+    charts[ctx.id] = new Chart(ctx, {
         type: 'line',
         data: {
             labels: years,
@@ -37312,6 +37406,60 @@ function showError(message) {
     // エラー表示の実装
 }
 
+// サーバーからの更新通知を購読（SSE）
+function subscribeToUpdates() {
+    if (!window.EventSource) return;
+
+    const source = new EventSource('/api/events');
+    let currentVersion = null;
+
+    source.addEventListener('version', (event) => {
+        const payload = JSON.parse(event.data);
+        if (currentVersion === null) {
+            currentVersion = payload.version;
+        } else if (payload.version !== currentVersion) {
+            showUpdateNotice('新しいデータが利用可能です。', true);
+        }
+    });
+
+    source.addEventListener('stage', (event) => {
+        const payload = JSON.parse(event.data);
+        const stageLabels = {
+            collect: 'データ収集',
+            analyze: 'AI分析',
+            generate: 'ダッシュボード生成',
+            publish: '公開'
+        };
+        const label = stageLabels[payload.stage] || payload.stage;
+        if (payload.status === 'started') {
+            showUpdateNotice(`🔄 ${label}中...`);
+        } else if (payload.status === 'failed') {
+            showUpdateNotice(`❌ ${label}に失敗しました`);
+        } else if (payload.stage === 'publish' && !payload.changed) {
+            hideUpdateNotice();
+        }
+    });
+}
+
+function showUpdateNotice(message, reloadable = false) {
+    let notice = document.getElementById('updateNotice');
+    if (!notice) {
+        notice = document.createElement('div');
+        notice.id = 'updateNotice';
+        notice.className = 'update-notice';
+        document.body.appendChild(notice);
+    }
+    notice.innerHTML = reloadable
+        ? `${message} <button onclick="location.reload()">再読み込み</button>`
+        : message;
+    notice.style.display = 'block';
+}
+
+function hideUpdateNotice() {
+    const notice = document.getElementById('updateNotice');
+    if (notice) notice.style.display = 'none';
+}
+
 // グローバル関数として公開
 window.switchTab = switchTab;
 window.updateDataTable = updateDataTable;
\ No newline at end of file
@@ -0,0 +1,88 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime
+
+# アプリケーション全体のロガー名
+ROOT_LOGGER = "dashboard"
+# ログレベル（DEBUGにすると指標ごとの取得ログも出力される）
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# 出力形式（text または json）
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+
+# LogRecord が標準で持つ属性（これ以外を構造化フィールドとして出力する）
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_setup_lock = threading.Lock()
+_listener = None
+
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRS}
+
+
+class TextFormatter(logging.Formatter):
+    """「時刻 レベル ロガー メッセージ key=value ...」形式で出力"""
+
+    def format(self, record):
+        line = (
+            f"{datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds')} "
+            f"{record.levelname:<7} {record.name} {record.getMessage()}"
+        )
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1オブジェクトのJSON形式で出力"""
+
+    def format(self, record):
+        payload = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_fields(record),
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging(level=None, log_format=None):
+    """キュー経由でバックグラウンドスレッドが書き出すロギングを設定（2回目以降は何もしない）"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(
+            JsonFormatter() if (log_format or LOG_FORMAT) == "json" else TextFormatter()
+        )
+
+        # 呼び出し側（イベントループ上のコルーチンなど）はキューに積むだけで戻る
+        log_queue = queue.SimpleQueue()
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.setLevel(level or LOG_LEVEL)
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(
+            log_queue, stream_handler, respect_handler_level=True
+        )
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    """モジュール用のロガーを返す"""
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,146 @@
+from html import escape
+
+# Chart.js 側と同じ配色
+PALETTE = ["#3498db", "#e74c3c", "#f39c12", "#9b59b6", "#1abc9c"]
+FONT = "'Segoe UI', Tahoma, Geneva, Verdana, sans-serif"
+
+# ダッシュボードの8つのチャートに対応するSVGの定義
+CHART_SPECS = {
+    "gdpChart": {"type": "bar", "indicator": "NY.GDP.MKTP.CD", "scale": 1e12, "unit": "兆ドル", "order": "desc"},
+    "gdpGrowthChart": {"type": "line", "indicator": "NY.GDP.MKTP.KD.ZG", "scale": 1, "unit": "%"},
+    "unemploymentChart": {"type": "bar", "indicator": "SL.UEM.TOTL.ZS", "scale": 1, "unit": "%", "order": "asc"},
+    "gdpPerCapitaChart": {"type": "bar", "indicator": "NY.GDP.PCAP.CD", "scale": 1, "unit": "ドル", "order": "desc"},
+    "inflationChart": {"type": "line", "indicator": "FP.CPI.TOTL.ZG", "scale": 1, "unit": "%"},
+    "tradeChart": {"type": "line", "indicator": "NE.TRD.GNFS.ZS", "scale": 1, "unit": "%"},
+    "populationChart": {"type": "line", "indicator": "SP.POP.TOTL", "scale": 1e6, "unit": "百万人"},
+    "fdiChart": {"type": "line", "indicator": "BX.KLT.DINV.CD.WD", "scale": 1e9, "unit": "10億ドル"},
+}
+# トレンドチャートに表示する国
+TREND_COUNTRIES = ["JPN", "USA", "CHN", "DEU", "GBR"]
+
+
+def _fmt(number):
+    return f"{number:.1f}".rstrip("0").rstrip(".")
+
+
+def _scale_points(values, x0, y0, width, height, lower=None, upper=None):
+    """値のリストを座標に変換（None はそのまま）"""
+    present = [v for v in values if v is not None]
+    lower = min(present) if lower is None else lower
+    upper = max(present) if upper is None else upper
+    span = (upper - lower) or 1
+    step = width / max(len(values) - 1, 1)
+    return [
+        None if v is None else (x0 + i * step, y0 + height - (v - lower) / span * height)
+        for i, v in enumerate(values)
+    ]
+
+
+def _polylines(points, color, stroke_width):
+    """欠損で途切れる折れ線を描画"""
+    segments, current = [], []
+    for point in points + [None]:
+        if point is None:
+            if current:
+                segments.append(current)
+            current = []
+        else:
+            current.append(point)
+    return "".join(
+        f'<polyline fill="none" stroke="{color}" stroke-width="{stroke_width}" '
+        f'stroke-linejoin="round" stroke-linecap="round" '
+        f'points="{" ".join(f"{_fmt(x)},{_fmt(y)}" for x, y in segment)}"/>'
+        if len(segment) > 1
+        else f'<circle cx="{_fmt(segment[0][0])}" cy="{_fmt(segment[0][1])}" r="{stroke_width}" fill="{color}"/>'
+        for segment in segments
+    )
+
+
+def render_sparkline(values, width=120, height=32, color=PALETTE[0]):
+    """スパークライン（軸なしの小さな折れ線）を描画"""
+    svg_open = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">'
+    )
+    if not any(v is not None for v in values):
+        return svg_open + "</svg>"
+    points = _scale_points(values, 2, 2, width - 4, height - 4)
+    last = next(p for p in reversed(points) if p is not None)
+    return (
+        svg_open
+        + _polylines(points, color, 1.5)
+        + f'<circle cx="{_fmt(last[0])}" cy="{_fmt(last[1])}" r="2.5" fill="{color}"/>'
+        + "</svg>"
+    )
+
+
+def _frame(width, height, body, title):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="{FONT}" font-size="11" role="img">'
+        f"<title>{escape(title)}</title>{body}</svg>"
+    )
+
+
+def _axis(lower, upper, x0, y0, plot_width, plot_height, unit):
+    """Y軸の目盛り（上端・中央・下端）と基準線を描画"""
+    body = ""
+    for fraction in (0, 0.5, 1):
+        value = lower + (upper - lower) * fraction
+        y = y0 + plot_height - plot_height * fraction
+        body += (
+            f'<line x1="{x0}" y1="{_fmt(y)}" x2="{x0 + plot_width}" y2="{_fmt(y)}" stroke="#eee"/>'
+            f'<text x="{x0 - 6}" y="{_fmt(y + 4)}" text-anchor="end" fill="#7f8c8d">{_fmt(value)}</text>'
+        )
+    body += f'<text x="{x0}" y="{y0 - 8}" fill="#7f8c8d">{escape(unit)}</text>'
+    return body
+
+
+def render_line_chart(years, series, unit, title, width=480, height=260):
+    """複数系列の折れ線チャートを描画（series は (ラベル, 値のリスト) のリスト）"""
+    x0, y0 = 48, 24
+    plot_width, plot_height = width - x0 - 16, height - y0 - 56
+    present = [v for _, values in series for v in values if v is not None]
+    if not present:
+        return _frame(width, height, "", title)
+    lower, upper = min(present + [0]), max(present)
+
+    body = _axis(lower, upper, x0, y0, plot_width, plot_height, unit)
+    for i, (_, values) in enumerate(series):
+        points = _scale_points(values, x0, y0, plot_width, plot_height, lower, upper)
+        body += _polylines(points, PALETTE[i % len(PALETTE)], 2)
+    for year_index in (0, len(years) - 1):
+        x = x0 + plot_width * year_index / max(len(years) - 1, 1)
+        body += f'<text x="{_fmt(x)}" y="{y0 + plot_height + 16}" text-anchor="middle" fill="#7f8c8d">{years[year_index]}</text>'
+    for i, (label, _) in enumerate(series):
+        x = x0 + i * (plot_width / max(len(series), 1))
+        body += (
+            f'<rect x="{_fmt(x)}" y="{height - 22}" width="10" height="10" fill="{PALETTE[i % len(PALETTE)]}"/>'
+            f'<text x="{_fmt(x + 14)}" y="{height - 13}" fill="#34495e">{escape(label)}</text>'
+        )
+    return _frame(width, height, body, title)
+
+
+def render_bar_chart(labels, values, unit, title, width=480, height=260):
+    """棒グラフを描画"""
+    x0, y0 = 48, 24
+    plot_width, plot_height = width - x0 - 16, height - y0 - 56
+    if not values:
+        return _frame(width, height, "", title)
+    lower, upper = min(values + [0]), max(values + [0])
+    span = (upper - lower) or 1
+    zero_y = y0 + plot_height - (0 - lower) / span * plot_height
+
+    body = _axis(lower, upper, x0, y0, plot_width, plot_height, unit)
+    slot = plot_width / len(values)
+    for i, (label, value) in enumerate(zip(labels, values)):
+        y = y0 + plot_height - (value - lower) / span * plot_height
+        x = x0 + i * slot + slot * 0.15
+        body += (
+            f'<rect x="{_fmt(x)}" y="{_fmt(min(y, zero_y))}" width="{_fmt(slot * 0.7)}" '
+            f'height="{_fmt(abs(zero_y - y))}" fill="{PALETTE[0]}"/>'
+            f'<text x="{_fmt(x + slot * 0.35)}" y="{y0 + plot_height + 14}" text-anchor="end" '
+            f'transform="rotate(-35 {_fmt(x + slot * 0.35)} {y0 + plot_height + 14})" '
+            f'fill="#34495e" font-size="10">{escape(label)}</text>'
+        )
+    return _frame(width, height, body, title)
@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+from src import derived_indicators
+from src.derived_indicators import ExpressionError, parse_expression
+from src.forecasting import series_forecast
+
+COUNTRY_NAMES = {"JPN": "Japan", "USA": "United States"}
+
+
+def _record(country, indicator, year, value):
+    return {
+        "country": COUNTRY_NAMES[country],
+        "countryCode": country,
+        "indicator": indicator,
+        "indicatorCode": indicator,
+        "year": year,
+        "value": value,
+        "unit": "",
+    }
+
+
+ECONOMIC_DATA = {
+    "byCountry": {
+        "JPN": {
+            "name": "日本",
+            "data": [
+                _record("JPN", "NY.GDP.MKTP.CD", 2020, 100.0),
+                _record("JPN", "NY.GDP.MKTP.CD", 2021, 110.0),
+                _record("JPN", "SP.POP.TOTL", 2020, 10.0),
+                _record("JPN", "SP.POP.TOTL", 2021, 10.0),
+            ],
+        },
+        "USA": {
+            "name": "アメリカ",
+            "data": [
+                _record("USA", "NY.GDP.MKTP.CD", 2020, 300.0),
+                _record("USA", "SP.POP.TOTL", 2020, 30.0),
+            ],
+        },
+    },
+}
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["1 +", "(NY.GDP.MKTP.CD", "NY.GDP.MKTP.CD )", "foo(1)", "wavg(SP.POP.TOTL)", "a $ b", "* 2"],
+)
+def test_parse_expression_rejects_invalid_input(expression):
+    with pytest.raises(ExpressionError):
+        parse_expression(expression)
+
+
+def test_parse_expression_precedence():
+    assert parse_expression("-A.B + 2 * C") == (
+        "bin", "+", ("neg", ("ref", "A.B")), ("bin", "*", ("num", 2.0), ("ref", "C")),
+    )
+
+
+def test_chained_derived_indicator(monkeypatch):
+    monkeypatch.setattr(derived_indicators, "DERIVED_INDICATORS", {
+        "DRV.A": {"expression": "NY.GDP.MKTP.CD / SP.POP.TOTL"},
+        "DRV.B": {"expression": "DRV.A * 2"},
+        "DRV.C": {"expression": "wavg(DRV.B, SP.POP.TOTL)"},
+    })
+    evaluator = derived_indicators._Evaluator(ECONOMIC_DATA, derived_indicators.load_definitions())
+
+    result = {}
+    worker = threading.Thread(
+        target=lambda: result.update(b=evaluator.records("DRV.B"), c=evaluator.records("DRV.C")),
+        daemon=True,
+    )
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive(), "chained evaluation deadlocked"
+
+    values = {(r["countryCode"], r["year"]): r["value"] for r in result["b"]}
+    assert values == {("JPN", 2020): 20.0, ("JPN", 2021): 22.0, ("USA", 2020): 20.0}
+    group = {r["year"]: r["value"] for r in result["c"]}
+    assert group == {2020: 20.0, 2021: 22.0}
+
+
+def test_invalid_and_cyclic_definitions_are_dropped(monkeypatch):
+    monkeypatch.setattr(derived_indicators, "DERIVED_INDICATORS", {
+        "DRV.X": {"expression": "DRV.Y + 1"},
+        "DRV.Y": {"expression": "DRV.X * 2"},
+        "DRV.BAD": {"expression": "NY.GDP.MKTP.CD / UNKNOWN.CODE"},
+        "DRV.DANGLING": {"expression": "DRV.BAD"},
+        "DRV.OK": {"expression": "NY.GDP.MKTP.CD * 2"},
+    })
+    assert list(derived_indicators.load_definitions()) == ["DRV.OK"]
+
+
+def _chained_evaluator(monkeypatch):
+    monkeypatch.setattr(derived_indicators, "DERIVED_INDICATORS", {
+        "DRV.A": {"expression": "NY.GDP.MKTP.CD / SP.POP.TOTL"},
+        "DRV.S": {"expression": "sum(DRV.A)"},
+    })
+    return derived_indicators._Evaluator(ECONOMIC_DATA, derived_indicators.load_definitions())
+
+
+def test_derived_records_use_native_country_names(monkeypatch):
+    evaluator = _chained_evaluator(monkeypatch)
+    names = {r["countryCode"]: r["country"] for r in evaluator.records("DRV.A")}
+    assert names == COUNTRY_NAMES
+    assert {r["country"] for r in evaluator.records("DRV.S")} == {derived_indicators.GROUP_NAME}
+
+
+def test_forecast_for_derived_indicator(monkeypatch):
+    evaluator = _chained_evaluator(monkeypatch)
+    forecast = series_forecast(evaluator.forecast("DRV.A"), "JPN", "DRV.A", "linear", 2)
+    assert forecast["values"] == [10.0, 11.0]
+    assert forecast["forecast"] == pytest.approx([12.0, 13.0])
+    group = series_forecast(evaluator.forecast("DRV.S"), "GRP", "DRV.S", "linear", 1)
+    assert group["values"] == [20.0, 11.0]
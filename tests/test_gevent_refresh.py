@@ -0,0 +1,81 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("gevent")
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+# gunicorn.conf.py の gevent ワーカーと同じく monkey patch した上で、
+# ローカルの偽の World Bank API を相手に更新処理を最後まで実行する
+SCRIPT = """
+from gevent import monkey
+
+monkey.patch_all()
+
+import json
+import time
+
+import gevent
+from gevent.pywsgi import WSGIServer
+
+
+def fake_api(environ, start_response):
+    parts = environ["PATH_INFO"].split("/")
+    country = parts[-3]
+    items = [
+        {"country": {"value": country}, "countryiso3code": country, "date": str(year), "value": float(year)}
+        for year in range(2010, 2024)
+    ]
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps([{"page": 1, "pages": 1}, items]).encode()]
+
+
+if __name__ == "__main__":
+    server = WSGIServer(("127.0.0.1", 0), fake_api, log=None)
+    server.start()
+
+    from src import data_collector, pipeline
+    from src.dataset_store import get_snapshot
+
+    data_collector.BASE_URL = f"http://127.0.0.1:{server.server_port}/v2"
+    assert pipeline.refresh_in_background()
+    deadline = time.time() + 30
+    while pipeline.refresh_lock.locked() and time.time() < deadline:
+        gevent.sleep(0.05)
+    summary = get_snapshot()["economic_data"]["summary"]
+    print(json.dumps({
+        "finished": not pipeline.refresh_lock.locked(),
+        "records": summary["totalRecords"],
+        "failedSeries": summary.get("failedSeries"),
+    }))
+"""
+
+
+def test_refresh_completes_under_gevent(tmp_path):
+    # 生成物の書き出し先がリポジトリを汚さないよう、src をコピーして実行する
+    shutil.copytree(
+        os.path.join(REPO_ROOT, "src"),
+        tmp_path / "src",
+        ignore=shutil.ignore_patterns(
+            "__pycache__", "svg", "countries", "indicators", "pages-manifest.json"
+        ),
+    )
+    (tmp_path / "run_refresh.py").write_text(SCRIPT, encoding="utf-8")
+
+    result = subprocess.run(
+        [sys.executable, "run_refresh.py"],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": str(tmp_path)},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    outcome = json.loads(result.stdout.strip().splitlines()[-1])
+    assert outcome == {"finished": True, "records": 120 * 14, "failedSeries": []}
+    assert len(os.listdir(tmp_path / "src" / "static" / "countries")) == 12